@@ -0,0 +1,448 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import random
+import time
+
+try:
+    import numpy as np
+except ImportError: # optional, only needed for batch decisions
+    np = None
+
+import mapgen
+from engine import FIELD_HEIGHT, FIELD_WIDTH, SIDE_COUNT, TANK_PER_SIDE, Action, FieldItemType, State, TankField, WhoWins
+from strategies import STRATEGIES, load_module, load_strategy
+
+# The rules of main.py's and main-ht.py's decide(), computed with numpy for
+# a batch of positions at once. Every condition of the scalar rules
+# becomes a boolean array over the batch and every `if` a np.where, in the
+# same order, so that the batch functions return exactly what decide()
+# returns for each position when given the same random numbers. The
+# random numbers come from `rng.random(shape)`, e.g. a seeded
+# np.random.default_rng(seed), a row per position taken in the order of
+# decide(), see Draws. decideMain() is main.py's policy as it is. The
+# endgame tables, safety search and routes of main-ht.py don't batch, so
+# decideHTRules() is a reduced policy, its phases alone: what decide()
+# chooses with HT_RULES and no endgame tables, not what the bot plays.
+# `python batch.py` checks both against decide() so reduced, on the
+# positions of random games.
+
+# the PARAMS of main-ht.py that turn off its searches, see decideHTRules()
+HT_RULES = {'safetyDepth': 0, 'planPaths': False}
+
+class Batch:
+    # a batch of positions: the item type of the first item of each cell,
+    # the tank positions and flags indexed by [position, side, tank], and
+    # the side to move with its last actions and those of the enemy
+    def __init__(self, fields, sides, lastActions):
+        n = len(fields)
+        self.n = n
+        self.index = np.arange(n)
+        self.content = np.zeros((n, FIELD_HEIGHT, FIELD_WIDTH), dtype=np.int8)
+        self.x = np.zeros((n, SIDE_COUNT, TANK_PER_SIDE), dtype=np.int64)
+        self.y = np.zeros((n, SIDE_COUNT, TANK_PER_SIDE), dtype=np.int64)
+        self.dead = np.zeros((n, SIDE_COUNT, TANK_PER_SIDE), dtype=bool)
+        for i, field in enumerate(fields):
+            for y in range(FIELD_HEIGHT):
+                for x in range(FIELD_WIDTH):
+                    cell = field.fieldContent[y][x]
+                    if cell:
+                        self.content[i, y, x] = cell[0].itemType
+            for s in range(SIDE_COUNT):
+                for t in range(TANK_PER_SIDE):
+                    tank = field.tanks[s][t]
+                    self.x[i, s, t], self.y[i, s, t], self.dead[i, s, t] = tank.x, tank.y, tank.destroyed
+        self.side = np.asarray(sides, dtype=np.int64)
+        self.lastAction = np.asarray(lastActions, dtype=np.int64)
+        self.enemyLastAction = np.asarray([field.lastActions[1 - side] for field, side in zip(fields, sides)], dtype=np.int64)
+
+        self.occupied = self.content != FieldItemType.Nil
+        bricks = self.content == FieldItemType.Brick
+        # running counts of the occupied cells along rows and columns, and
+        # of the bricks along columns: index k counts the cells before k
+        self.rowCount = np.pad(self.occupied.cumsum(axis=2), ((0, 0), (0, 0), (1, 0)))
+        self.columnCount = np.pad(self.occupied.cumsum(axis=1), ((0, 0), (1, 0), (0, 0)))
+        self.columnBricks = np.pad(bricks.cumsum(axis=1), ((0, 0), (1, 0), (0, 0)))
+
+    # positions
+
+    def me(self, tank: int):
+        return self.x[self.index, self.side, tank], self.y[self.index, self.side, tank]
+
+    def enemy(self, target: int):
+        return self.x[self.index, 1 - self.side, target], self.y[self.index, 1 - self.side, target]
+
+    def enemyDead(self, target: int):
+        return self.dead[self.index, 1 - self.side, target]
+
+    def enemyBase(self):
+        return np.full(self.n, 4), (1 - self.side) * 8
+
+    def inRange(self, x, y):
+        return (x >= 0) & (x < FIELD_WIDTH) & (y >= 0) & (y < FIELD_HEIGHT)
+
+    def cell(self, x, y):
+        # the item type at (x, y), Nil out of range
+        inside = self.inRange(x, y)
+        return np.where(inside, self.content[self.index, np.clip(y, 0, FIELD_HEIGHT - 1), np.clip(x, 0, FIELD_WIDTH - 1)], FieldItemType.Nil)
+
+    # TankField queries
+
+    def noBrick(self, x1, y1, x2, y2):
+        sameColumn = x1 == x2
+        sameRow = y1 == y2
+        lo = np.where(sameColumn, np.minimum(y1, y2), np.minimum(x1, x2))
+        hi = np.where(sameColumn, np.maximum(y1, y2), np.maximum(x1, x2))
+        x = np.clip(x1, 0, FIELD_WIDTH - 1)
+        y = np.clip(y1, 0, FIELD_HEIGHT - 1)
+        lo = np.clip(lo, 0, FIELD_WIDTH - 1)
+        hi = np.clip(hi, 0, FIELD_WIDTH - 1)
+        inColumn = self.columnCount[self.index, hi, x] - self.columnCount[self.index, lo + 1, x]
+        inRow = self.rowCount[self.index, y, hi] - self.rowCount[self.index, y, lo + 1]
+        between = np.where(sameColumn, inColumn, inRow)
+        return (sameColumn ^ sameRow) & (hi > lo) & (between == 0)
+
+    def canMove(self, side, tank: int, move: int):
+        x, y = self.x[self.index, side, tank], self.y[self.index, side, tank]
+        tx, ty = x + [0, 1, 0, -1][move], y + [-1, 0, 1, 0][move]
+        mate = (tx == self.x[self.index, side, 1 - tank]) & (ty == self.y[self.index, side, 1 - tank])
+        content = self.cell(tx, ty)
+        return self.inRange(tx, ty) & (mate | (content == FieldItemType.Nil) | (content == FieldItemType.Tank))
+
+    def canShot(self, tank: int, shoot: int):
+        # the first item in the direction of the shot, as far as the
+        # scalar version looks
+        x, y = self.me(tank)
+        tx, ty = x + [0, 1, 0, -1][shoot % 4], y + [-1, 0, 1, 0][shoot % 4]
+        mx, my = self.x[self.index, self.side, 1 - tank], self.y[self.index, self.side, 1 - tank]
+        content = self.cell(tx, ty)
+        hit = (content == FieldItemType.Brick) | (content == FieldItemType.Base) | (content == FieldItemType.Tank)
+        return self.inRange(tx, ty) & ~((tx == mx) & (ty == my)) & hit
+
+    def shootTowards(self, x, y, tx, ty):
+        return np.where(x == tx, np.where(y > ty, Action.UpShoot, Action.DownShoot),
+                        np.where(x > tx, Action.LeftShoot, Action.RightShoot))
+
+    def canShootTank(self, tank: int, target: int, movex: int = 0, movey: int = 0):
+        x, y = self.me(tank)
+        x, y = x + movex, y + movey
+        tx, ty = self.enemy(target)
+        ok = ~((x == tx) & (y == ty)) & ~self.enemyDead(target) & self.noBrick(x, y, tx, ty)
+        return np.where(ok, self.shootTowards(x, y, tx, ty), Action.Invalid)
+
+    def canShootBase(self, tank: int):
+        x, y = self.me(tank)
+        tx, ty = self.enemyBase()
+        # blocked by bricks, the shot still opens the way unless a tank can
+        # be shot instead
+        tankInSight = np.zeros(self.n, dtype=bool)
+        for target in range(TANK_PER_SIDE):
+            tankInSight |= self.canShootTank(tank, target) != Action.Invalid
+        ok = (y == ty) & (self.noBrick(x, y, tx, ty) | ~tankInSight)
+        return np.where(ok, np.where(x > tx, Action.LeftShoot, Action.RightShoot), Action.Invalid)
+
+    def canShootTankVertically(self, tank: int, target: int, steps: int, move: int):
+        # canShootTankUpwards with move Up, canShootTankDownwords with Down
+        x, y = self.me(tank)
+        tx, ty = self.enemy(target)
+        ty = ty - steps if move == Action.Up else ty + steps
+        ok = self.inRange(tx, ty) & self.noBrick(x, y, tx, ty) & (x != tx) & self.canMove(1 - self.side, target, move)
+        return np.where(ok, np.where(x > tx, Action.LeftShoot, Action.RightShoot), Action.Invalid)
+
+    def enemyOnColumn(self, tank: int):
+        # whether an enemy is on the column of the tank, and the first one
+        x, _ = self.me(tank)
+        found = np.zeros(self.n, dtype=bool)
+        first = np.zeros(self.n, dtype=np.int64)
+        for target in reversed(range(TANK_PER_SIDE)):
+            tx, _ = self.enemy(target)
+            on = ~self.enemyDead(target) & (tx == x)
+            first = np.where(on, target, first)
+            found |= on
+        return found, first
+
+    def numBetweenTanks(self, tank: int, target):
+        x, y1 = self.me(tank)
+        y2 = self.y[self.index, 1 - self.side, target]
+        lo, hi = np.minimum(y1, y2), np.maximum(y1, y2)
+        return self.columnBricks[self.index, hi, x] - self.columnBricks[self.index, lo, x]
+
+    def distanceYToBase(self, side):
+        baseY = (1 - side) * 8
+        return np.minimum(np.abs(self.y[self.index, side, 0] - baseY), np.abs(self.y[self.index, side, 1] - baseY))
+
+    def distanceToBrick(self, tank: int):
+        x, y = self.me(tank)
+        bricks = self.content[self.index, :, x] == FieldItemType.Brick
+        distance = np.abs(np.arange(FIELD_HEIGHT)[None, :] - y[:, None])
+        return np.where(bricks, distance, FIELD_HEIGHT).min(axis=1)
+
+    def actionValid(self, tank: int, action: int):
+        # moves only, which is all main.py asks for
+        x, y = self.me(tank)
+        tx, ty = x + [0, 1, 0, -1][action], y + [-1, 0, 1, 0][action]
+        return self.inRange(tx, ty) & (self.cell(tx, ty) == FieldItemType.Nil)
+
+    def getCloserToBase(self, tank: int, action: int):
+        x, y = self.me(tank)
+        tx, ty = self.enemyBase()
+        nx, ny = x + [0, 1, 0, -1][action], y + [-1, 0, 1, 0][action]
+        return (nx != FIELD_WIDTH // 2) & (np.abs(tx - nx) + np.abs(ty - ny) < np.abs(tx - x) + np.abs(ty - y))
+
+def is_shoot(action):
+    return action >= Action.UpShoot
+
+class Draws:
+    # the random numbers of the positions, a row of `count` each, taken in
+    # the order of decide(): the k-th rng.random() of decide() on position
+    # i is row i, column k, and a position that doesn't draw at some point
+    # doesn't use up a number. A numpy generator fills the rows one after
+    # the other, so a batch of one position draws what decide() draws from
+    # the same generator.
+    def __init__(self, rng, n: int, count: int):
+        self.u = rng.random((n, count))
+        self.taken = np.zeros(n, dtype=np.int64)
+
+    def take(self, needed):
+        # the next number of every position, used up where `needed`
+        value = self.u[np.arange(len(self.taken)), np.minimum(self.taken, self.u.shape[1] - 1)]
+        self.taken += needed
+        return value
+
+def pick(options, count, u):
+    # options[int(u * count)] with options an (n, k) array, like choice()
+    # in main.py, Stay if count is 0
+    index = np.minimum((u * count).astype(np.int64), np.maximum(count - 1, 0))
+    return np.where(count > 0, options[np.arange(len(u)), index], Action.Stay)
+
+def decideMain(batch: Batch, rng):
+    # main.py's decide(), a number drawn by choice() at most for each tank
+    draws = Draws(rng, batch.n, TANK_PER_SIDE)
+    blue = batch.side == 0
+    actions = np.full((batch.n, TANK_PER_SIDE), Action.Stay, dtype=np.int64)
+    for tank in range(TANK_PER_SIDE):
+        x, y = batch.me(tank)
+        shot = is_shoot(batch.lastAction[:, tank])
+        baseX, baseY = batch.enemyBase()
+
+        # the enemy base is on the same row
+        tankOnRow = np.zeros(batch.n, dtype=bool)
+        leftToTank = np.zeros(batch.n, dtype=bool)
+        for target in range(TANK_PER_SIDE):
+            tx, ty = batch.enemy(target)
+            sameHalf = (tx - FIELD_WIDTH // 2) * (x - FIELD_WIDTH // 2) > 0
+            tankOnRow |= sameHalf & (ty == y)
+            leftToTank |= ~batch.enemyDead(target) & sameHalf & (x < tx)
+        left = np.where(tankOnRow, leftToTank, x < baseX)
+        onBaseRow = np.where(shot, Action.Stay, np.where(left, Action.RightShoot, Action.LeftShoot))
+
+        # closer moves, in the order of the scalar list
+        closer = np.zeros((batch.n, 5), dtype=np.int64)
+        count = np.zeros(batch.n, dtype=np.int64)
+        for move in range(4):
+            ok = batch.actionValid(tank, move) & batch.getCloserToBase(tank, move)
+            closer[batch.index, count] = np.where(ok, move, closer[batch.index, count])
+            count += ok
+
+        forward = np.where(blue, Action.Down, Action.Up)
+        forwardShoot = np.where(blue, Action.DownShoot, Action.UpShoot)
+        nearBrick = batch.distanceToBrick(tank) == 1
+        found, first = batch.enemyOnColumn(tank)
+        bricks = batch.numBetweenTanks(tank, first)
+        # choice() of an empty list draws nothing
+        draw = draws.take((y != baseY) & np.where(found, bricks == 1, ~nearBrick & (count > 0)))
+
+        # no enemy on the column
+        noEnemy = np.where(nearBrick, np.where(shot, forward, forwardShoot), pick(closer, count, draw))
+
+        # an enemy on the column
+        validLeft, validRight = batch.actionValid(tank, Action.Left), batch.actionValid(tank, Action.Right)
+        sideStep = np.where(blue,
+                            np.where(validLeft, Action.Left, np.where(validRight, Action.Right, Action.Stay)),
+                            np.where(validRight, Action.Right, np.where(validLeft, Action.Left, Action.Stay)))
+        validForward = np.where(blue, batch.actionValid(tank, Action.Down), batch.actionValid(tank, Action.Up))
+        closer[batch.index, count] = Action.Stay
+        enemy = np.where(bricks == 0, np.where(shot, sideStep, forwardShoot),
+                         np.where(bricks > 1, np.where(shot, np.where(validForward, forward, Action.Stay), forwardShoot),
+                                  pick(closer, count + 1, draw)))
+
+        actions[:, tank] = np.where(y == baseY, onBaseRow, np.where(found, enemy, noEnemy))
+    return actions
+
+def load_ht():
+    return load_module(STRATEGIES['ht'])
+
+# the phases of main-ht.py's decide(), updating `actions` and `destroyed`
+# where the positions are still undecided
+
+def shootBase(batch, actions, destroyed, draws, params):
+    for tank in range(TANK_PER_SIDE):
+        r = batch.canShootBase(tank)
+        update = ~is_shoot(batch.lastAction[:, tank]) & (r > 0)
+        actions[:, tank] = np.where(update, r, actions[:, tank])
+
+def shootTank(batch, actions, destroyed, draws, params):
+    forward = np.where(batch.side == 0, Action.Down, Action.Up)
+    for tank in range(TANK_PER_SIDE):
+        undecided = actions[:, tank] == Action.Invalid
+        shot = is_shoot(batch.lastAction[:, tank])
+        canForward = np.where(batch.side == 0, batch.canMove(batch.side, tank, Action.Down), batch.canMove(batch.side, tank, Action.Up))
+        canLeft = batch.canMove(batch.side, tank, Action.Left)
+        canRight = batch.canMove(batch.side, tank, Action.Right)
+        for target in range(TANK_PER_SIDE):
+            r = batch.canShootTank(tank, target)
+            hit = undecided & ~destroyed[:, target] & (r != Action.Invalid)
+            actions[:, tank] = np.where(hit & ~shot, r, actions[:, tank])
+            destroyed[:, tank] |= hit & ~shot
+            # avoid to be shot: step aside if the enemy can shoot
+            enemyShot = is_shoot(batch.enemyLastAction[:, target])
+            aside = np.where(canLeft, Action.Left, np.where(canRight, Action.Right, actions[:, tank]))
+            actions[:, tank] = np.where(hit & shot, np.where(enemyShot, np.where(canForward, forward, Action.Invalid), aside),
+                                        actions[:, tank])
+
+def shootBeforehand(batch, actions, destroyed, draws, params):
+    move = np.where(batch.side == 0, Action.Up, Action.Down)
+    for tank in range(TANK_PER_SIDE):
+        undecided = actions[:, tank] == Action.Invalid
+        shot = is_shoot(batch.lastAction[:, tank])
+        for target in range(TANK_PER_SIDE):
+            r1 = np.where(batch.side == 0, batch.canShootTankVertically(tank, target, 1, Action.Up),
+                          batch.canShootTankVertically(tank, target, 1, Action.Down))
+            r2 = np.where(batch.side == 0, batch.canShootTankVertically(tank, target, 2, Action.Up),
+                          batch.canShootTankVertically(tank, target, 2, Action.Down))
+            alive = undecided & ~destroyed[:, tank]
+            # where decide() calls random()
+            mayWait = alive & ~shot & (r1 == Action.Invalid) & (r2 != Action.Invalid)
+            mayWaitAfterShoot = alive & shot & ((r1 != Action.Invalid) | (r2 != Action.Invalid))
+            draw = draws.take(mayWait | mayWaitAfterShoot)
+            fire = alive & ~shot & (r1 != Action.Invalid)
+            wait = mayWait & (draw > params['waitThreshold'])
+            waitAfterShoot = mayWaitAfterShoot & (draw > params['waitAfterShootThreshold'])
+            actions[:, tank] = np.where(fire, r1, np.where(wait | waitAfterShoot, Action.Stay, actions[:, tank]))
+
+def protect(batch, actions, destroyed, draws, params):
+    behind = batch.distanceYToBase(batch.side) >= batch.distanceYToBase(1 - batch.side)
+    for tank in range(TANK_PER_SIDE):
+        pending = (actions[:, tank] == Action.Invalid) & behind
+        canRight = batch.canMove(batch.side, tank, Action.Right)
+        canLeft = batch.canMove(batch.side, tank, Action.Left)
+        for target in range(TANK_PER_SIDE):
+            right = pending & canRight & (batch.canShootTank(tank, target, 1, 0) != Action.Invalid)
+            left = pending & ~right & canLeft & (batch.canShootTank(tank, target, -1, 0) != Action.Invalid)
+            actions[:, tank] = np.where(right, Action.Right, np.where(left, Action.Left, actions[:, tank]))
+            pending &= ~(right | left)
+
+def otherwise(batch, actions, destroyed, draws, params):
+    blue = batch.side == 0
+    for tank in range(TANK_PER_SIDE):
+        undecided = actions[:, tank] == Action.Invalid
+        shot = is_shoot(batch.lastAction[:, tank])
+        canUp = batch.canMove(batch.side, tank, Action.Up)
+        canDown = batch.canMove(batch.side, tank, Action.Down)
+        canLeft = batch.canMove(batch.side, tank, Action.Left)
+        canRight = batch.canMove(batch.side, tank, Action.Right)
+
+        found, first = batch.enemyOnColumn(tank)
+        dist = batch.numBetweenTanks(tank, first)
+        _, y = batch.me(tank)
+        up = y > batch.y[batch.index, 1 - batch.side, first]
+        towards = np.where(up, np.where(canUp, Action.Up, Action.Stay), np.where(canDown, Action.Down, Action.Stay))
+        shootOrMove = np.where(up, np.where(~shot, Action.UpShoot, np.where(canUp, Action.Up, Action.Stay)),
+                               np.where(~shot, Action.DownShoot, np.where(canDown, Action.Down, Action.Stay)))
+        enemy = np.where(dist == 1, towards, shootOrMove)
+
+        canForward = np.where(blue, canDown, canUp)
+        forward = np.where(blue, Action.Down, Action.Up)
+        forwardShoot = np.where(blue, Action.DownShoot, Action.UpShoot)
+        canShotForward = np.where(blue, batch.canShot(tank, Action.DownShoot), batch.canShot(tank, Action.UpShoot))
+        noEnemy = np.where(canForward, forward,
+                           np.where(~shot & canShotForward, forwardShoot,
+                                    np.where(canLeft, Action.Left, np.where(canRight, Action.Right, Action.Stay))))
+
+        actions[:, tank] = np.where(undecided, np.where(found, enemy, noEnemy), actions[:, tank])
+
+PHASES = [shootBase, shootTank, shootBeforehand, protect, otherwise]
+
+def decideHTRules(batch: Batch, rng, params: dict = None):
+    # the reduced policy of main-ht.py, only the priorities and thresholds
+    # of `params` are used, the PARAMS of main-ht.py by default
+    if params is None:
+        params = load_ht().PARAMS
+    # shootBeforehand() draws a number at most for each tank and target
+    draws = Draws(rng, batch.n, TANK_PER_SIDE * TANK_PER_SIDE)
+    actions = np.full((batch.n, TANK_PER_SIDE), Action.Invalid, dtype=np.int64)
+    destroyed = batch.dead[batch.index, 1 - batch.side].copy()
+    for phase in sorted(PHASES, key=lambda phase: params[phase.__name__ + 'Priority']):
+        phase(batch, actions, destroyed, draws, params)
+    return np.where(actions == Action.Invalid, Action.Stay, actions)
+
+class Row:
+    # the rng of decide() drawing a row of Draws
+    def __init__(self, values):
+        self.values = iter(values)
+
+    def random(self) -> float:
+        return float(next(self.values))
+
+def positions(count: int, seed: int):
+    # (fields, sides) of random games, both sides of each turn
+    decide = load_strategy('random')
+    rng = random.Random(seed)
+    fields, sides = [], []
+    while len(fields) < count:
+        field = TankField()
+        field.fromBinary(mapgen.generate(rng))
+        state = State(rng)
+        while field.whoWins() == WhoWins.NotFinished and len(fields) < count:
+            for side in range(SIDE_COUNT):
+                fields.append(field.clone())
+                sides.append(side)
+            actions = [decide(field, side, state) for side in range(SIDE_COUNT)]
+            for side in range(SIDE_COUNT):
+                field.setActions(side, actions[side])
+            field.doActions()
+    return fields[:count], sides[:count]
+
+def check(count: int, seed: int):
+    # decideMain() and decideHTRules() with np.random.default_rng(seed)
+    # against decide() drawing the same rows, main-ht.py's with HT_RULES:
+    # the positions that differ and the seconds of both
+    ht = load_ht()
+    params = dict(ht.PARAMS)
+    ht.PARAMS.update(HT_RULES)
+    ht.endgame = False
+    fields, sides = positions(count, seed)
+    batch = Batch(fields, sides, [field.lastActions[side] for field, side in zip(fields, sides)])
+    results = {}
+    try:
+        for name, decideBatch, decide, width in (('main', decideMain, load_strategy('random'), TANK_PER_SIDE),
+                                                 ('ht rules', decideHTRules, ht.decide, TANK_PER_SIDE * TANK_PER_SIDE)):
+            start = time.perf_counter()
+            actions = decideBatch(batch, np.random.default_rng(seed))
+            batchSeconds = time.perf_counter() - start
+            rows = np.random.default_rng(seed).random((count, width))
+            start = time.perf_counter()
+            scalar = [decide(field, side, State(Row(row))) for field, side, row in zip(fields, sides, rows)]
+            scalarSeconds = time.perf_counter() - start
+            differ = [i for i in range(count) if list(actions[i]) != scalar[i]]
+            results[name] = differ, batchSeconds, scalarSeconds
+    finally:
+        ht.PARAMS.clear()
+        ht.PARAMS.update(params)
+        ht.endgame = None
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Check the batch decisions against decide() on random positions.')
+    parser.add_argument('-n', '--count', type=int, default=2000, help='number of positions')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the games and of the random numbers')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    for name, (differ, batchSeconds, scalarSeconds) in check(args.count, args.seed).items():
+        print('{}: {}/{} positions differ, batch {:.1f} ms, decide() {:.1f} ms'.format(
+            name, len(differ), args.count, batchSeconds * 1e3, scalarSeconds * 1e3))
+        for i in differ[:5]:
+            print('  position {}'.format(i))
@@ -0,0 +1,58 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import os
+import re
+
+from strategies import STRATEGIES
+
+# Botzone takes a bot as a single file: the bot with the modules of this
+# directory it imports at the top level (engine.py, safety.py, endgame.py)
+# pasted in place of their `from module import` lines, each once, without
+# their command lines. Data files such as the endgame tables aren't
+# bundled, the bot must do without them.
+
+ENGINE = 'engine.py'
+LOCAL_IMPORT = re.compile(r'^from (\w+) import [^\n]*\n', re.MULTILINE)
+# the command line of a module, which would run in the bundle as it runs
+# as __main__
+MAIN_BLOCK = re.compile(r'^if __name__ == .__main__.:\n(?:[ \t]+[^\n]*\n|\n)*', re.MULTILINE)
+
+def bundle(path: str) -> str:
+    root = os.path.dirname(os.path.abspath(__file__))
+    pasted = set()
+
+    def paste(path: str, module: bool = True) -> str:
+        with open(os.path.join(root, path), encoding='utf-8') as f:
+            source = f.read()
+        if module:
+            source = MAIN_BLOCK.sub('', source)
+        parts, end = [], 0
+        for match in LOCAL_IMPORT.finditer(source):
+            module = match.group(1) + '.py'
+            if not os.path.isfile(os.path.join(root, module)):
+                continue
+            parts.append(source[end:match.start()])
+            end = match.end()
+            if module not in pasted:
+                pasted.add(module)
+                parts.append('\n# ---- {} ----\n'.format(module) + paste(module) + '# ---- {} ----\n\n'.format(path))
+        parts.append(source[end:])
+        return ''.join(parts)
+
+    bundled = paste(path, module=False)
+    if ENGINE not in pasted:
+        raise ValueError('{} does not import engine'.format(path))
+    return bundled
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Bundle a bot and engine.py into one file to upload to Botzone.')
+    parser.add_argument('strategy', help='one of {}, or the path of a bot'.format(', '.join(sorted(STRATEGIES))))
+    parser.add_argument('-o', '--output', required=True, help='the file to write')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(bundle(STRATEGIES.get(args.strategy, args.strategy)))
@@ -0,0 +1,73 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+from engine import DEBUG_ENV
+
+# The full debug output of the bots, switched on by $TANK_DEBUG, a
+# directory. The response only carries a bounded summary of the debug
+# list (engine.summarizeDebug), the whole list of each turn goes to
+# <directory>/<pid>.jsonl, one {"turn", "side", "time", "debug"} line per
+# turn. The lines are serialized and written by a thread after the
+# response is out, while the bot waits for the next request, so that
+# verbose debugging adds nothing to the time of a move. A line is flushed
+# as soon as it is written, the log of a bot killed by the driver lacks
+# at most the turns still in the queue.
+
+class DebugLog:
+
+    def __init__(self, path: str):
+        self.file = open(path, 'a')
+        self.lines = queue.Queue()
+        threading.Thread(target=self._write, daemon=True).start()
+
+    def write(self, turn: int, side: int, debug: list):
+        # `debug` must not change afterwards, State.debug is a new list
+        # every turn
+        if debug:
+            self.lines.put((turn, side, time.time(), debug))
+
+    def _write(self):
+        while True:
+            entry = self.lines.get()
+            if entry is None:
+                break
+            turn, side, when, debug = entry
+            self.file.write(json.dumps({'turn': turn, 'side': side, 'time': when, 'debug': debug}, default=str) + '\n')
+            self.file.flush()
+            self.lines.task_done()
+
+    def close(self):
+        # waits for the lines in the queue
+        self.lines.join()
+        self.lines.put(None)
+        self.file.close()
+
+def start(directory: str) -> DebugLog:
+    os.makedirs(directory, exist_ok=True)
+    return DebugLog(os.path.join(directory, '{}.jsonl'.format(os.getpid())))
+
+# the log of the in-process bots, by directory
+_logs = {}
+
+def shared(directory: str) -> DebugLog:
+    # one log for all the bots played in this process, complete at exit
+    if directory not in _logs:
+        _logs[directory] = start(directory)
+        atexit.register(_logs[directory].close)
+    return _logs[directory]
+
+def enable(directory: str):
+    # logs the debug output of the bots played from now on, in-process or
+    # in processes started by this one
+    os.environ[DEBUG_ENV] = os.path.abspath(directory)
+
+def load(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
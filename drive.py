@@ -1,8 +1,28 @@
 #! /usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import argparse
 import json
+import queue
+import os
+import random
+import shlex
+import shutil
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+import debuglog
+import profiling
+import shmring
+import tracer
+from engine import Action, TankField, BotzoneIO, State, WhoWins, SIDE_COUNT, TANK_PER_SIDE, TRACE_ENV, PROFILE_ENV, DEBUG_ENV, \
+    TRANSPORT_ENV, NO_SPAN, span
+from mapgen import load_corpus
+from strategies import STRATEGIES, load_strategy
 
 init_grid = [
     [0, 0, 0, 0, 0, 0, 0, 0, 0],
@@ -16,6 +36,17 @@ init_grid = [
     [1, 1, 0, 0, 0, 0, 0, 0, 0]
 ]
 
+KEEP_RUNNING = '>>>BOTZONE_REQUEST_KEEP_RUNNING<<<'
+
+# per-turn time limits in seconds, Botzone gives long-running bots more
+# time on the first turn than on the later ones
+FIRST_TURN_TIMEOUT = 2.0
+TURN_TIMEOUT = 1.0
+
+# the rows of a match trace: one per side and one for the referee's field
+SIDE_NAMES = ['blue', 'red']
+FIELD_TID = SIDE_COUNT
+
 def to_binary(data):
     field = [['0'] * 27, ['0'] * 27, ['0'] * 27]
     for i in range(3):
@@ -25,42 +56,355 @@ def to_binary(data):
                     field[i][26 - (y % 3 * 9 + x)] = '1'
     return [int("".join(line), 2) for line in field]
 
-def start_proc(command):
-    return subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+def _pump_proc(proc):
+    # runs in a background thread so that reads can time out, each line
+    # with the time it arrived at, however late it is read
+    for line in proc.stdout:
+        line = line.decode('utf-8').strip()
+        if line and line != KEEP_RUNNING:
+            proc.lines.put((line, time.monotonic()))
+    proc.lines.put((None, time.monotonic()))
+
+def start_proc(command, env=None):
+    proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env)
+    proc.lines = queue.Queue()
+    threading.Thread(target=_pump_proc, args=(proc,), daemon=True).start()
+    return proc
 
 def write_to_proc(proc, payload):
-    proc.stdin.write(payload.encode('utf-8'))
-    proc.stdin.flush()
+    try:
+        proc.stdin.write(payload.encode('utf-8'))
+        proc.stdin.flush()
+    except OSError:
+        pass # the bot is gone, the following read reports it
 
-def read_from_proc(proc):
-    return proc.stdout.readline().decode('utf-8').strip()
+def read_timed(proc, timeout=None):
+    # (line, time.monotonic() it arrived at), the line is None if the bot
+    # exits or doesn't answer within `timeout` seconds
+    try:
+        return proc.lines.get(timeout=timeout)
+    except queue.Empty:
+        return None, time.monotonic()
 
-if __name__ == '__main__':
-    init_data = to_binary(init_grid)
+def read_from_proc(proc, timeout=None):
+    return read_timed(proc, timeout)[0]
+
+def kill_proc(proc):
+    if proc.poll() is None:
+        proc.kill()
+    proc.wait()
+
+class ProcessPlayer:
+    # a bot in its own process, the requests and responses are JSON lines
+    def __init__(self, command, env=None):
+        self.proc = start_proc(command, env)
+        self.sent = 0.0
+        self.failed = False
+
+    def send(self, request):
+        write_to_proc(self.proc, json.dumps(request) + '\n')
+        self.sent = time.monotonic()
+
+    def receive(self, timeout):
+        # (response line or None, seconds from the request to the response),
+        # both bots think concurrently, each against its own deadline. The
+        # other bot may have been waited for first, the seconds are those
+        # of the arrival of the line.
+        line, arrived = read_timed(self.proc, max(0.0, self.sent + timeout - time.monotonic()))
+        seconds = arrived - self.sent
+        self.failed = line is None or seconds > timeout
+        return (line if not self.failed else None), seconds
+
+    def failure(self):
+        return 'timeout' if self.proc.poll() is None else 'crash'
+
+    def close(self):
+        # closing stdin lets a bot waiting for a request save its profile
+        # and exit, one that failed is killed
+        if not self.failed and self.proc.poll() is None:
+            try:
+                self.proc.stdin.close()
+                self.proc.wait(timeout=1.0)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        kill_proc(self.proc)
+
+class SharedMemoryPlayer:
+    # a bot in a worker process of shmring.py, taken from the idle workers
+    # of the same command and given back after a game it played through
+    def __init__(self, command, env):
+        self.command = command
+        self.env = env
+        self.worker = shmring.take(command, env)
+        self.proc = self.worker.proc
+        self.sent = 0.0
+        self.failed = False
+
+    def send(self, request):
+        # the JSON requests of run_match as records
+        if 'requests' in request:
+            request = request['requests'][0]
+        if isinstance(request, dict):
+            self.worker.send(shmring.NEW_GAME, request['mySide'], bricks=request['field'])
+        else:
+            self.worker.send(shmring.ACTIONS, 0, actions=request)
+        self.sent = time.monotonic()
+
+    def receive(self, timeout):
+        # (actions or None, seconds from the request to the response), the
+        # worker stamps its response as the other bot may be waited for first
+        actions, written = self.worker.receive(self.sent + timeout)
+        self.failed = actions is None
+        return actions, max(0.0, written - self.sent)
+
+    def failure(self):
+        return 'timeout' if self.proc.poll() is None else 'crash'
 
-    player_blue = start_proc(['python', 'main.py'])
-    player_red = start_proc(['python', 'main.py'])
+    def close(self):
+        # a traced bot writes to the trace of its match, it isn't kept
+        if self.worker is None:
+            return
+        if self.failed or self.proc.poll() is not None or self.env.get(TRACE_ENV):
+            self.worker.close(kill=self.failed)
+        else:
+            shmring.give(self.worker, self.command, self.env)
+        self.worker = None
 
-    write_to_proc(player_blue, json.dumps({'field': init_data, 'mySide': 0}) + '\n')
-    write_to_proc(player_red, json.dumps({'field': init_data, 'mySide': 1}) + '\n')
+class InProcessPlayer:
+    # a registered strategy called directly on its own view of the field,
+    # without starting a process or importing the bot again for each game
+    def __init__(self, name, seed=None, profiler=None, debugLog=None):
+        self.decide = load_strategy(name)
+        self.profiler = profiler
+        self.debugLog = debugLog
+        self.field = TankField()
+        self.io = BotzoneIO()
+        self.state = State(random.Random(seed))
+        self.line = None
+        self.sent = 0.0
+        self.elapsed = 0.0
+        self.crashed = False
 
-    while True:
-        r1 = read_from_proc(player_blue)
-        r2 = read_from_proc(player_red)
+    def send(self, request):
+        # decides right away, receive() only checks the time it took
+        self.sent = time.monotonic()
+        self.line = None
+        try:
+            with span('readInput'):
+                self.io.processInput(self.field, request)
+            if self.state.globaldata is None:
+                self.state.globaldata = self.io.globaldata
+            self.state.debug = []
+            with span('decide', turn=self.field.currentTurn), self.profiler or NO_SPAN:
+                actions = self.decide(self.field, self.io.mySide, self.state)
+            self.field.setActions(self.io.mySide, actions)
+            self.line = json.dumps({'response': actions, 'globaldata': self.state.globaldata})
+        except Exception:
+            traceback.print_exc()
+            self.crashed = True
+        self.elapsed = time.monotonic() - self.sent
+        if self.debugLog:
+            self.debugLog.write(self.field.currentTurn, self.io.mySide, self.state.debug)
 
-        print('r1', r1)
-        print('r2', r2)
-        print('-----------------------------')
+    def receive(self, timeout):
+        if self.elapsed > timeout:
+            return None, self.elapsed
+        return self.line, self.elapsed
 
-        res1 = {
-            'requests': [json.loads(r2)['response']],
-            'responses': [],
-        }
+    def failure(self):
+        return 'crash' if self.crashed else 'timeout'
 
-        res2 = {
-            'requests': [json.loads(r1)['response']],
-            'responses': [],
-        }
+    def close(self):
+        pass
+
+def make_player(bot, env=None, seed=None):
+    # a strategy name is played in-process, a command list in a process,
+    # a worker of shmring.py if $TANK_TRANSPORT is shm. Each bot is
+    # profiled in its own directory of $TANK_PROFILE. Only the in-process
+    # bots take the seed of their random numbers.
+    env = dict(os.environ if env is None else env)
+    root = env.get(PROFILE_ENV)
+    if isinstance(bot, str):
+        debugLog = debuglog.shared(env[DEBUG_ENV]) if env.get(DEBUG_ENV) else None
+        return InProcessPlayer(bot, seed, profiling.forBot(root, bot) if root else None, debugLog)
+    if root:
+        env[PROFILE_ENV] = os.path.join(root, profiling.botLabel(bot))
+    if env.get(TRANSPORT_ENV) == 'shm':
+        return SharedMemoryPlayer(bot, env)
+    return ProcessPlayer(bot, env)
+
+def parse_bot(text):
+    # the --blue/--red syntax: a registered strategy or a shell command
+    return text if text in STRATEGIES else shlex.split(text)
+
+def parse_response(line):
+    # a JSON line, or the actions of a shared memory bot
+    if isinstance(line, list):
+        actions = line
+    else:
+        try:
+            actions = json.loads(line)['response']
+        except (ValueError, TypeError, KeyError):
+            return None
+    if not isinstance(actions, list) or len(actions) != TANK_PER_SIDE:
+        return None
+    # an action out of range, or a bool, is an invalid response too
+    if not all(type(action) is int and Action.Stay <= action <= Action.LeftShoot for action in actions):
+        return None
+    return actions
+
+def parse_globaldata(line, default):
+    # the globaldata of a response, `default` if it has none
+    try:
+        globaldata = json.loads(line).get('globaldata')
+    except (ValueError, AttributeError):
+        return default
+    return default if globaldata is None else globaldata
+
+def run_match(bots, init_data, first_turn_timeout=FIRST_TURN_TIMEOUT, turn_timeout=TURN_TIMEOUT, verbose=False,
+              trace=None, seed=None, globaldata=None):
+    # `trace`: the path of a Chrome trace of the match to write, `seed`: of
+    # the in-process bots, side s plays with seed * SIDE_COUNT + s.
+    # `globaldata`: the strings Botzone keeps for the bots across games, by
+    # side, the result has the ones they output last.
+    field = TankField()
+    field.fromBinary(init_data)
+    env = None
+    if trace:
+        # the bots in a process trace into files of their own, merged at the end
+        directory = tempfile.mkdtemp(prefix='tank-trace-')
+        env = dict(os.environ, **{TRACE_ENV: directory})
+        tracing = tracer.start(os.path.join(directory, 'drive.json'))
+        tracing.nameProcess('drive')
+        for side in range(SIDE_COUNT):
+            tracing.nameThread(SIDE_NAMES[side], side)
+        tracing.nameThread('field', FIELD_TID)
+        fieldTracer = tracer.FieldTracer(tracing, field, FIELD_TID)
+    players = [make_player(bot, env, None if seed is None else seed * SIDE_COUNT + side) for side, bot in enumerate(bots)]
+    if trace:
+        for side, player in enumerate(players):
+            if isinstance(player, (ProcessPlayer, SharedMemoryPlayer)):
+                tracing.nameProcess('{}: {}'.format(SIDE_NAMES[side], ' '.join(bots[side])), player.proc.pid)
+    requests = [{'field': init_data, 'mySide': side} for side in range(SIDE_COUNT)]
+    if globaldata is not None:
+        globaldata = list(globaldata)
+        requests = [{'requests': [requests[side]], 'responses': [], 'globaldata': globaldata[side]}
+                    for side in range(SIDE_COUNT)]
+    elapsed = [[] for side in range(SIDE_COUNT)]
+    failures = [None] * SIDE_COUNT
+    winner = WhoWins.NotFinished
+
+    try:
+        while winner == WhoWins.NotFinished:
+            limit = first_turn_timeout if field.currentTurn == 1 else turn_timeout
+
+            for side in range(SIDE_COUNT):
+                if trace:
+                    tracing.tid = side # the spans of an in-process strategy
+                players[side].send(requests[side])
+
+            responses = [None] * SIDE_COUNT
+            for side in range(SIDE_COUNT):
+                line, seconds = players[side].receive(limit)
+                elapsed[side].append(seconds)
+                if trace:
+                    tracing.complete('turn {}'.format(field.currentTurn), int(players[side].sent * 1e6), int(seconds * 1e6),
+                                     side, response=line)
+                if verbose:
+                    print('r{}'.format(side + 1), line)
+                if line is None:
+                    failures[side] = players[side].failure()
+                    players[side].close()
+                    continue
+                responses[side] = parse_response(line)
+                if globaldata is not None and isinstance(line, str):
+                    globaldata[side] = parse_globaldata(line, globaldata[side])
+                if responses[side] is None or not field.setActions(side, responses[side]):
+                    failures[side] = 'invalid'
+            if verbose:
+                print('-----------------------------')
+
+            if any(failures):
+                # the side that failed loses, as the Botzone judge does
+                if all(failures):
+                    winner = WhoWins.Draw
+                else:
+                    winner = WhoWins.Red if failures[WhoWins.Blue] else WhoWins.Blue
+                break
+
+            with span('doActions', tid=FIELD_TID, turn=field.currentTurn):
+                field.doActions()
+                if trace:
+                    fieldTracer.flush()
+            winner = field.whoWins()
+
+            requests = [{
+                'requests': [responses[1 - side]],
+                'responses': [],
+            } for side in range(SIDE_COUNT)]
+    finally:
+        for player in players:
+            player.close()
+        profiling.saveAll()
+        if trace:
+            tracing.instant('game over', FIELD_TID, winner=winner, failures=failures)
+            fieldTracer.detach()
+            tracer.stop()
+            tracer.merge([os.path.join(directory, name) for name in sorted(os.listdir(directory))], trace)
+            shutil.rmtree(directory)
+
+    return {
+        'winner': winner,
+        'turns': field.currentTurn - 1,
+        'failures': failures,
+        'elapsed': elapsed,
+        'globaldata': globaldata,
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Play one Tank match between two Botzone bots.')
+    parser.add_argument('--blue', default='{} main.py'.format(sys.executable),
+                        help='command of the blue bot, or one of {} to play it in-process'.format(', '.join(sorted(STRATEGIES))))
+    parser.add_argument('--red', default='{} main.py'.format(sys.executable),
+                        help='command of the red bot, or one of {} to play it in-process'.format(', '.join(sorted(STRATEGIES))))
+    parser.add_argument('--first-turn-timeout', type=float, default=FIRST_TURN_TIMEOUT,
+                        help='time limit of the first turn, in seconds')
+    parser.add_argument('--turn-timeout', type=float, default=TURN_TIMEOUT,
+                        help='time limit of the other turns, in seconds')
+    parser.add_argument('--maps', help='corpus of maps generated by mapgen.py to pick the map from')
+    parser.add_argument('--trace', help='write a Chrome trace of the match to this file')
+    parser.add_argument('--profile', help='profile the decisions of the bots into this directory')
+    parser.add_argument('--profile-mode', choices=profiling.MODES, default=profiling.MODES[0],
+                        help='deterministic (cProfile) or sampling profiler')
+    parser.add_argument('--transport', choices=['json', 'shm'], default='json',
+                        help='JSON lines as on Botzone, or shared memory with the bots kept between games')
+    parser.add_argument('--debug', help='log the full debug output of the bots into this directory')
+    parser.add_argument('-q', '--quiet', action='store_true', help='only print the result')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.profile:
+        profiling.enable(args.profile, args.profile_mode)
+    if args.debug:
+        debuglog.enable(args.debug)
+    if args.transport == 'shm':
+        shmring.enable()
+    if args.maps:
+        init_data = random.choice(load_corpus(args.maps))
+    else:
+        init_data = to_binary(init_grid)
+    try:
+        result = run_match([parse_bot(args.blue), parse_bot(args.red)], init_data,
+                           args.first_turn_timeout, args.turn_timeout, not args.quiet, args.trace)
+    finally:
+        shmring.closeAll()
 
-        write_to_proc(player_blue, json.dumps(res1) + '\n')
-        write_to_proc(player_red, json.dumps(res2) + '\n')
+    for side in range(SIDE_COUNT):
+        times = result['elapsed'][side]
+        print('side {}: {}, max {:.3f}s, mean {:.3f}s'.format(
+            side, result['failures'][side] or 'ok', max(times), sum(times) / len(times)))
+    print('winner', result['winner'], 'after', result['turns'], 'turns')
+    if args.profile:
+        for path in profiling.collect(args.profile):
+            print('profile', path)
@@ -0,0 +1,303 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import os
+import time
+from array import array
+
+from engine import FIELD_HEIGHT, FIELD_WIDTH, SIDE_COUNT, Action, dx, dy
+from mapgen import pack, load_corpus
+from symmetry import brickBits
+
+# Exact results of the endgames with one tank per side on a fixed brick
+# layout, solved backwards from the won positions. A position is a won
+# one for a side if it has an action that wins against every action of
+# the enemy, the moves being simultaneous. A shot that destroys a brick
+# changes the layout and leaves the table, such a position counts as
+# unknown, so the wins and losses stored are exact but some positions
+# that are won in the real game are missing.
+#
+# A table has one byte per (blue cell, red cell, blue cooldown, red
+# cooldown): 0 if unknown or a draw, 2d - 1 if blue wins in d turns and
+# 2d if red wins in d turns.
+
+CELLS = FIELD_HEIGHT * FIELD_WIDTH
+STATES = CELLS * CELLS * 4
+MAX_DEPTH = 127
+MAX_TURN = 100
+
+STEEL = [1 * FIELD_WIDTH + 4, 7 * FIELD_WIDTH + 4]
+BASES = [0 * FIELD_WIDTH + 4, 8 * FIELD_WIDTH + 4]
+
+# the tables shipped with the bot, next to this file
+DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'endgame')
+
+# outcomes of a turn that leave the table, besides the next position
+BLUE_WINS = STATES
+RED_WINS = STATES + 1
+UNKNOWN = STATES + 2
+
+def stateIndex(blue: int, red: int, blueCooldown: bool, redCooldown: bool) -> int:
+    return ((blue * CELLS + red) * 2 + blueCooldown) * 2 + redCooldown
+
+class Layout:
+
+    def __init__(self, bricks: int):
+        self.bricks = bricks
+        self.free = [not (bricks >> cell & 1) and cell not in STEEL and cell not in BASES for cell in range(CELLS)]
+        self.neighbors = []
+        for cell in range(CELLS):
+            x, y = cell % FIELD_WIDTH, cell // FIELD_WIDTH
+            self.neighbors.append([(y + dy[d]) * FIELD_WIDTH + x + dx[d]
+                                   if 0 <= x + dx[d] < FIELD_WIDTH and 0 <= y + dy[d] < FIELD_HEIGHT else -1
+                                   for d in range(4)])
+
+    def actions(self, cell: int, cooldown: bool, other: int):
+        actions = [Action.Stay]
+        for d in range(4):
+            target = self.neighbors[cell][d]
+            if target >= 0 and self.free[target] and target != other:
+                actions.append(d)
+        if not cooldown:
+            actions.extend(range(Action.UpShoot, Action.LeftShoot + 1))
+        return actions
+
+    def step(self, blue: int, red: int, blueAction: int, redAction: int) -> int:
+        # the same rules as TankField.doActions with one tank per side
+        if Action.Up <= blueAction < Action.UpShoot:
+            blue = self.neighbors[blue][blueAction]
+        if Action.Up <= redAction < Action.UpShoot:
+            red = self.neighbors[red][redAction]
+        lost = [False, False]
+        brickHit = False
+        for side, cell, action, other, otherAction in ((0, blue, blueAction, red, redAction),
+                                                       (1, red, redAction, blue, blueAction)):
+            if action < Action.UpShoot:
+                continue
+            d = action % 4
+            while True:
+                cell = self.neighbors[cell][d]
+                if cell < 0:
+                    break
+                if cell == other:
+                    if blue != red and otherAction >= Action.UpShoot and d == (otherAction + 2) % 4:
+                        break
+                    lost[1 - side] = True
+                    break
+                if cell in BASES:
+                    lost[BASES.index(cell)] = True
+                    break
+                if cell in STEEL:
+                    break
+                if not self.free[cell]:
+                    brickHit = True
+                    break
+        if lost[0] and lost[1]:
+            return UNKNOWN
+        if lost[1]:
+            return BLUE_WINS
+        if lost[0]:
+            return RED_WINS
+        if brickHit:
+            return UNKNOWN
+        return stateIndex(blue, red, blueAction >= Action.UpShoot, redAction >= Action.UpShoot)
+
+# the positions examined between two yields of solving(), a few ms
+STEP_STATES = 1024
+
+def solving(bricks: int):
+    # solve() in steps: a generator that yields now and then and returns the
+    # table, to spread the work over several turns
+    layout = Layout(bricks)
+    cells = [cell for cell in range(CELLS) if layout.free[cell]]
+
+    # all the outcomes of each position, rows by blue action, columns by red
+    transitions = {}
+    for blue in cells:
+        yield
+        for red in cells:
+            for blueCooldown in (False, True):
+                for redCooldown in (False, True):
+                    blueActions = layout.actions(blue, blueCooldown, red)
+                    redActions = layout.actions(red, redCooldown, blue)
+                    transitions[stateIndex(blue, red, blueCooldown, redCooldown)] = [
+                        array('l', [layout.step(blue, red, a, b) for b in redActions]) for a in blueActions
+                    ]
+
+    # the winner of every position decided so far, with the terminal
+    # outcomes appended: 1 blue, 2 red
+    winner = bytearray(STATES + 3)
+    winner[BLUE_WINS] = 1
+    winner[RED_WINS] = 2
+    table = bytearray(STATES)
+    undecided = list(transitions)
+    for depth in range(1, MAX_DEPTH + 1):
+        decided = []
+        remaining = []
+        for i, state in enumerate(undecided):
+            if i % STEP_STATES == 0:
+                yield
+            rows = transitions[state]
+            if any(all(winner[outcome] == 1 for outcome in row) for row in rows):
+                decided.append((state, 1))
+            elif any(all(winner[row[b]] == 2 for row in rows) for b in range(len(rows[0]))):
+                decided.append((state, 2))
+            else:
+                remaining.append(state)
+        if not decided:
+            break
+        # only mark them now, the positions won in this round must not
+        # make others won in the same round
+        for state, side in decided:
+            winner[state] = side
+            table[state] = 2 * depth - 1 if side == 1 else 2 * depth
+        undecided = remaining
+    return table
+
+def advance(steps, deadline: float = None):
+    # runs the generator of solving() until the table is done, or until
+    # time.perf_counter() passes `deadline`: None then, the generator can
+    # go on later
+    try:
+        while deadline is None or time.perf_counter() < deadline:
+            next(steps)
+    except StopIteration as done:
+        return done.value
+    return None
+
+def solve(bricks: int) -> bytearray:
+    return advance(solving(bricks))
+
+def tableName(bricks: int) -> str:
+    return '{:021x}.tb'.format(bricks)
+
+class EndgameTables:
+    # tables of a directory, read the first time a position on their layout
+    # is probed. Solving a missing layout takes a second or two, more than
+    # a turn on Botzone: with solveMissing it is solved at once, with a
+    # `budget` it is solved `budget` seconds per probe, over the next
+    # turns, as long as the layout stays the same. The layouts of a game
+    # are those of the corpus only until the first brick broken.
+
+    def __init__(self, directory: str = DIRECTORY, solveMissing: bool = False, budget: float = 0.0):
+        self.directory = directory
+        self.solveMissing = solveMissing
+        self.budget = budget
+        self.tables = {}
+        # (layout, generator of solving()) of the layout being solved
+        self.solving = None
+
+    def load(self, bricks: int):
+        if bricks not in self.tables:
+            path = os.path.join(self.directory, tableName(bricks))
+            table = None
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    table = f.read()
+            elif self.solveMissing:
+                table = bytes(solve(bricks))
+                if os.path.isdir(self.directory):
+                    with open(path, 'wb') as f:
+                        f.write(table)
+            elif self.budget > 0:
+                if self.solving is None or self.solving[0] != bricks:
+                    self.solving = bricks, solving(bricks)
+                table = advance(self.solving[1], time.perf_counter() + self.budget)
+                if table is None:
+                    return None
+                table = bytes(table)
+                self.solving = None
+            self.tables[bricks] = table
+        return self.tables[bricks]
+
+    def position(self, field):
+        # (layout, blue tank, red tank) if the field is a one against one
+        # endgame, None otherwise
+        if field.bases[0].destroyed or field.bases[1].destroyed:
+            return None
+        tanks = []
+        for side in range(SIDE_COUNT):
+            alive = [tank for tank in field.tanks[side] if not tank.destroyed]
+            if len(alive) != 1:
+                return None
+            tanks.append(alive[0])
+        return brickBits(field), tanks[0], tanks[1]
+
+    def probe(self, field, side: int):
+        # (result, depth) for `side`, result is 1 for a win, -1 for a loss
+        # and 0 if unknown, or None if no table covers the field
+        position = self.position(field)
+        if position is None:
+            return None
+        bricks, blue, red = position
+        table = self.load(bricks)
+        if table is None:
+            return None
+        value = table[stateIndex(blue.y * FIELD_WIDTH + blue.x, red.y * FIELD_WIDTH + red.x,
+                                 field.lastActions[0][blue.tankID] >= Action.UpShoot,
+                                 field.lastActions[1][red.tankID] >= Action.UpShoot)]
+        if value == 0:
+            return 0, 0
+        result = 1 if (value % 2 == 1) == (side == 0) else -1
+        return result, (value + 1) // 2
+
+    def bestAction(self, field, side: int):
+        # the actions of `side` that win fastest if the field is a won
+        # endgame that ends before the turn limit, None otherwise
+        probe = self.probe(field, side)
+        if probe is None or probe[0] != 1 or field.currentTurn + probe[1] - 1 > MAX_TURN:
+            return None
+        bricks, blue, red = self.position(field)
+        table = self.load(bricks)
+        layout = Layout(bricks)
+        tanks = [blue, red]
+        cells = [tank.y * FIELD_WIDTH + tank.x for tank in tanks]
+        cooldowns = [field.lastActions[s][tanks[s].tankID] >= Action.UpShoot for s in range(SIDE_COUNT)]
+        mine = layout.actions(cells[side], cooldowns[side], cells[1 - side])
+        theirs = layout.actions(cells[1 - side], cooldowns[1 - side], cells[side])
+
+        def turns(outcome):
+            if outcome == (BLUE_WINS if side == 0 else RED_WINS):
+                return 1
+            if outcome < STATES and table[outcome] and (table[outcome] % 2 == 1) == (side == 0):
+                return (table[outcome] + 1) // 2 + 1
+            return MAX_DEPTH + 1
+
+        best, bestTurns = None, MAX_DEPTH + 1
+        for action in mine:
+            worst = 0
+            for enemyAction in theirs:
+                pair = (action, enemyAction) if side == 0 else (enemyAction, action)
+                worst = max(worst, turns(layout.step(cells[0], cells[1], *pair)))
+            if worst < bestTurns:
+                best, bestTurns = action, worst
+        if best is None:
+            return None
+        return [best if tank is tanks[side] else Action.Stay for tank in field.tanks[side]]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Solve the one against one endgames of Tank layouts.')
+    parser.add_argument('-o', '--output', default=DIRECTORY, help='directory of the tables')
+    parser.add_argument('--maps', help='corpus of maps generated by mapgen.py to solve')
+    parser.add_argument('--count', type=int, default=1, help='number of maps of the corpus to solve')
+    parser.add_argument('--field', help='a JSON field of a Botzone request to solve')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    layouts = []
+    if args.field:
+        layouts.append(pack(json.loads(args.field)))
+    if args.maps:
+        layouts.extend(pack(bricks) for bricks in load_corpus(args.maps)[:args.count])
+    os.makedirs(args.output, exist_ok=True)
+    for bricks in layouts:
+        start = time.time()
+        table = solve(bricks)
+        with open(os.path.join(args.output, tableName(bricks)), 'wb') as f:
+            f.write(table)
+        wins = sum(1 for value in table if value % 2 == 1)
+        losses = sum(1 for value in table if value and value % 2 == 0)
+        print('{}: {} blue wins, {} red wins, {:.1f}s'.format(tableName(bricks), wins, losses, time.time() - start))
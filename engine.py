@@ -0,0 +1,633 @@
+# Tank 游戏引擎
+# The rules of https://www.botzone.org.cn/games/Tank and the Botzone
+# input/output shared by the bots, the driver and the tools. A bot is a
+# strategy decide(field, side, state) -> actions, see strategies.py.
+import json
+import os
+import sys
+import random
+from typing import List
+
+FIELD_HEIGHT = 9
+FIELD_WIDTH = 9
+SIDE_COUNT = 2
+TANK_PER_SIDE = 2
+
+dx = [ 0, 1, 0, -1 ]
+dy = [ -1, 0, 1, 0 ]
+
+class FieldItemType():
+    Nil = 0
+    Brick = 1
+    Steel = 2
+    Base = 3
+    Tank = 4
+
+class Action():
+    Invalid = -2
+    Stay = -1
+    Up = 0
+    Right = 1
+    Down = 2
+    Left = 3
+    UpShoot = 4
+    RightShoot = 5
+    DownShoot = 6
+    LeftShoot = 7
+
+class WhoWins():
+    NotFinished = -2
+    Draw = -1
+    Blue = 0
+    Red = 1
+
+class FieldObject:
+    def __init__(self, x: int, y: int, itemType: FieldItemType):
+        self.x = x
+        self.y = y
+        self.itemType = itemType
+        self.destroyed = False
+
+class Base(FieldObject):
+    def __init__(self, side: int):
+        super().__init__(4, side * 8, FieldItemType.Base)
+        self.side = side
+
+class Tank(FieldObject):
+    def __init__(self, side: int, tankID: int, x: int = -1, y: int = -1):
+        super().__init__(x if x != -1 else (6 if side ^ tankID else 2), y if y != -1 else (side * 8), FieldItemType.Tank)
+        self.side = side
+        self.tankID = tankID
+
+class Board:
+    # the tables of what never changes in a game: the steel walls, the
+    # neighbours of each cell by direction (None off the field), the ray of
+    # cells a shot crosses from each cell in each direction, and the
+    # segment of cells strictly between two cells of a row or column
+    def __init__(self):
+        self.steel = [(4, 1), (4, 7)]
+        self.neighbors = [[[(x + dx[d], y + dy[d]) if 0 <= x + dx[d] < FIELD_WIDTH and 0 <= y + dy[d] < FIELD_HEIGHT else None
+                            for d in range(4)] for x in range(FIELD_WIDTH)] for y in range(FIELD_HEIGHT)]
+        self.rays = [[[self._ray(x, y, d) for d in range(4)] for x in range(FIELD_WIDTH)] for y in range(FIELD_HEIGHT)]
+        self.segments = {}
+        for y in range(FIELD_HEIGHT):
+            for x in range(FIELD_WIDTH):
+                for ray in self.rays[y][x]:
+                    for i, (tx, ty) in enumerate(ray):
+                        self.segments[x, y, tx, ty] = ray[:i]
+
+    def _ray(self, x: int, y: int, d: int) -> tuple:
+        cells = []
+        while self.neighbors[y][x][d]:
+            x, y = self.neighbors[y][x][d]
+            cells.append((x, y))
+        return tuple(cells)
+
+class TankField:
+    # built by the first field of the process, before the first request is
+    # read, so during the first turn and its longer time limit
+    board = None
+
+    def __init__(self):
+        if TankField.board is None:
+            TankField.board = Board()
+        self.fieldContent = [
+            [[] for x in range(FIELD_WIDTH)] for y in range(FIELD_HEIGHT)
+        ]
+        # False for the rows shared with a clone, see clone()
+        self.ownedRows = [True] * FIELD_HEIGHT
+        # notified by itemInserted/itemRemoved when an item is put on or
+        # removed from the field, see evaluation.py and tracer.py
+        self.observers = []
+        self.tanks = [[Tank(s, t) for t in range(TANK_PER_SIDE)] for s in range(SIDE_COUNT)]
+        self.bases = [Base(s) for s in range(SIDE_COUNT)]
+        self.lastActions = [[Action.Invalid for t in range(TANK_PER_SIDE)] for s in range(SIDE_COUNT)]
+        self.actions = [[Action.Invalid for t in range(TANK_PER_SIDE)] for s in range(SIDE_COUNT)]
+        self.currentTurn = 1
+
+        for tanks in self.tanks:
+            for tank in tanks:
+                self.insertFieldItem(tank)
+        for base in self.bases:
+            self.insertFieldItem(base)
+        for x, y in self.board.steel:
+            self.insertFieldItem(FieldObject(x, y, FieldItemType.Steel))
+
+    def clone(self) -> 'TankField':
+        # a fork of the field for speculative moves. The rows without a
+        # tank or base are shared with the fork until one of the two writes
+        # them, the others are copied along with their items, and the
+        # tanks and bases are new objects. The fork has no observers.
+        field = TankField.__new__(TankField)
+        field.observers = []
+        field.tanks = [[Tank(s, t, tank.x, tank.y) for t, tank in enumerate(tanks)] for s, tanks in enumerate(self.tanks)]
+        field.bases = [Base(s) for s in range(SIDE_COUNT)]
+        items = {}
+        for old, new in zip(self.tanks[0] + self.tanks[1] + self.bases, field.tanks[0] + field.tanks[1] + field.bases):
+            new.destroyed = old.destroyed
+            items[id(old)] = new
+        field.lastActions = [list(actions) for actions in self.lastActions]
+        field.actions = [list(actions) for actions in self.actions]
+        field.currentTurn = self.currentTurn
+
+        field.fieldContent = list(self.fieldContent)
+        field.ownedRows = [False] * FIELD_HEIGHT
+        for item in self.tanks[0] + self.tanks[1] + self.bases:
+            if not item.destroyed and not field.ownedRows[item.y]:
+                field.fieldContent[item.y] = [[items.get(id(i)) or FieldObject(i.x, i.y, i.itemType) for i in cell]
+                                              for cell in self.fieldContent[item.y]]
+                field.ownedRows[item.y] = True
+        for y in range(FIELD_HEIGHT):
+            if not field.ownedRows[y]:
+                self.ownedRows[y] = False
+        return field
+
+    def _ownRow(self, y: int):
+        # copies a shared row and its bricks before writing it, it holds no
+        # tank or base (clone() copies those rows)
+        self.fieldContent[y] = [[i if i.itemType == FieldItemType.Steel else FieldObject(i.x, i.y, i.itemType) for i in cell]
+                                for cell in self.fieldContent[y]]
+        self.ownedRows[y] = True
+
+    def insertFieldItem(self, item: FieldObject):
+        if not self.ownedRows[item.y]:
+            self._ownRow(item.y)
+        self.fieldContent[item.y][item.x].append(item)
+        item.destroyed = False
+        for observer in self.observers:
+            observer.itemInserted(item)
+
+    def removeFieldItem(self, item: FieldObject):
+        if not self.ownedRows[item.y]:
+            self._ownRow(item.y)
+        cell = self.fieldContent[item.y][item.x]
+        if item not in cell:
+            # a brick found in a shared row, the row has been copied since
+            item = next(i for i in cell if i.itemType == item.itemType)
+        cell.remove(item)
+        item.destroyed = True
+        for observer in self.observers:
+            observer.itemRemoved(item)
+
+    def fromBinary(self, bricks: List[int]):
+        for i in range(3):
+            mask = 1
+            for y in range(i * 3, i * 3 + 3):
+                for x in range(FIELD_WIDTH):
+                    if bricks[i] & mask:
+                        self.insertFieldItem(FieldObject(x, y, FieldItemType.Brick))
+                    mask = mask << 1
+
+    def fromMatrix(self, m):
+        # the tanks the matrix doesn't show are destroyed
+        for side in range(SIDE_COUNT):
+            for tank in self.tanks[side]:
+                tank.destroyed = True
+        for y in range(0, FIELD_HEIGHT):
+            if not self.ownedRows[y]:
+                self._ownRow(y)
+            for x in range(0, FIELD_WIDTH):
+                if m[y][x] == 0:
+                    self.fieldContent[y][x] = []
+                elif m[y][x] == 1:
+                    self.fieldContent[y][x] = [FieldObject(x, y, FieldItemType.Brick)]
+                elif m[y][x] in [-1, -2, -3, -4]:
+                    side, no = (-m[y][x] - 1) // 2, (-m[y][x] - 1) % 2
+                    self.tanks[side][no] = Tank(side, no, x, y)
+                    self.fieldContent[y][x] = [self.tanks[side][no]]
+                else:
+                    pass
+
+    def actionValid(self, side: int, tank: int, action: Action) -> bool:
+        if action >= Action.UpShoot and self.lastActions[side][tank] >= Action.UpShoot:
+            return False
+        if action == Action.Stay or action >= Action.UpShoot:
+            return True
+        me = self.tanks[side][tank]
+        cell = self.board.neighbors[me.y][me.x][action]
+        return cell is not None and not self.fieldContent[cell[1]][cell[0]]
+
+    def noBrick(self, x1, y1, x2, y2):
+        # False if the cells aren't two different cells of a row or column
+        segment = self.board.segments.get((x1, y1, x2, y2))
+        if segment is None:
+            return False
+        for x, y in segment:
+            if self.fieldContent[y][x] and not self.fieldContent[y][x][0].destroyed:
+                return False
+        return True
+
+    def canShootBase(self, side: int, tank: int):
+        x, y = self.tanks[side][tank].x, self.tanks[side][tank].y
+        tx, ty = self.bases[1-side].x, self.bases[1-side].y
+        if y == ty:
+            if self.noBrick(x, y, tx, ty):
+                return Action.LeftShoot if x > tx else Action.RightShoot
+            for target in range(TANK_PER_SIDE):
+                if self.canShootTank(side, tank, target) != Action.Invalid:
+                    return Action.Invalid
+            return Action.LeftShoot if x > tx else Action.RightShoot
+        else:
+            return Action.Invalid
+
+    def canShootTank(self, side: int, tank: int, target: int, movex: int = 0, movey: int = 0):
+        x, y = self.tanks[side][tank].x + movex, self.tanks[side][tank].y + movey
+        tx, ty = self.tanks[1 - side][target].x, self.tanks[1 - side][target].y
+
+        if (x == tx and y == ty): return Action.Invalid
+        if self.tanks[1 - side][target].destroyed:
+            return Action.Invalid
+        if self.noBrick(x, y, tx, ty):
+            if x == tx:
+                return Action.UpShoot if y > ty else Action.DownShoot
+            else:
+                return Action.LeftShoot if x > tx else Action.RightShoot
+        else:
+            return Action.Invalid
+
+    # when the target move upwards, if we can hit it
+    def canShootTankUpwards(self, side: int, tank: int, target: int, steps: int = 1):
+        x, y = self.tanks[side][tank].x, self.tanks[side][tank].y
+        tx, ty = self.tanks[1 - side][target].x, self.tanks[1 - side][target].y - steps
+        if ty < 0:
+            return Action.Invalid
+        if self.noBrick(x, y, tx, ty):
+            if x == tx:
+                return Action.Invalid
+                # return Action.UpShoot if y > ty else Action.DownShoot
+            else:
+                if self.canMove(1-side, target, Action.Up):
+                    return Action.LeftShoot if x > tx else Action.RightShoot
+                else:
+                    return Action.Invalid
+        else:
+            return Action.Invalid
+
+    # when the target move downwards, if we can hit it
+    def canShootTankDownwords(self, side: int, tank: int, target: int, steps: int = 1):
+        x, y = self.tanks[side][tank].x, self.tanks[side][tank].y
+        tx, ty = self.tanks[1 - side][target].x, self.tanks[1 - side][target].y + steps
+        if ty >= FIELD_HEIGHT:
+            return Action.Invalid
+        if self.noBrick(x, y, tx, ty):
+            if x == tx:
+                return Action.Invalid
+                # return Action.UpShoot if y > ty else Action.DownShoot
+            else:
+                if self.canMove(1-side, target, Action.Down):
+                    return Action.LeftShoot if x > tx else Action.RightShoot
+                else:
+                    return Action.Invalid
+        else:
+            return Action.Invalid
+
+    def canMove(self, side: int, tank: int, move: int):
+        # `move` is Up, Right, Down or Left
+        me = self.tanks[side][tank]
+        cell = self.board.neighbors[me.y][me.x][move]
+        if cell is None:
+            return False
+        tx, ty = cell
+        if tx == self.tanks[side][1-tank].x and ty == self.tanks[side][1-tank].y:
+            return True
+        if self.fieldContent[ty][tx] and \
+                self.fieldContent[ty][tx][0].itemType == FieldItemType.Tank:
+            return True
+        if self.fieldContent[ty][tx] and not self.fieldContent[ty][tx][0].destroyed:
+            return False
+        return True
+
+    def canShot(self, side: int, tank: int, shoot: int):
+        me, mate = self.tanks[side][tank], self.tanks[side][1-tank]
+        for x, y in self.board.rays[me.y][me.x][shoot % 4]:
+            if x == mate.x and y == mate.y and not mate.destroyed:
+                return False # don't suicide
+            if self.fieldContent[y][x] and self.fieldContent[y][x][0].itemType == FieldItemType.Steel:
+                return False
+            if self.fieldContent[y][x] and self.fieldContent[y][x][0].itemType == FieldItemType.Brick:
+                return True
+            if self.fieldContent[y][x] and self.fieldContent[y][x][0].itemType == FieldItemType.Base:
+                return True
+            if self.fieldContent[y][x] and self.fieldContent[y][x][0].itemType == FieldItemType.Tank:
+                return True
+        return False
+
+    def enemyBaseOnSameRow(self, side: int, tank: int) -> bool:
+        pos_y = self.tanks[side][tank].y
+
+        base_y = self.bases[1 - side].y
+
+        return (pos_y == base_y)
+
+    def enemyTankOnSameRow(self, side: int, tank: int) -> bool:
+        pos_y = self.tanks[side][tank].y
+        pos_x = self.tanks[side][tank].x
+
+        for k in self.tanks[1 - side]:
+            # Two tanks on the same side
+            if (k.x - FIELD_WIDTH // 2) * (pos_x - FIELD_WIDTH // 2) > 0:
+                if pos_y == k.y: return True
+        return False
+
+    def leftToBase(self, side: int, tank: int) -> bool:
+        pos_x = self.tanks[side][tank].x
+
+        base_x = self.bases[1 - side].x
+
+        return (pos_x < base_x)
+
+    def leftToTank(self, side: int, tank: int) -> bool:
+        pos_y = self.tanks[side][tank].y
+        pos_x = self.tanks[side][tank].x
+
+        for k in self.tanks[1 - side]:
+            # Two tanks on the same side
+            if (k.destroyed): continue
+            if (k.x - FIELD_WIDTH // 2) * (pos_x - FIELD_WIDTH // 2) > 0:
+                if pos_x < k.x: return True
+        return False
+
+    def enemyTankOnSameColumn(self, side: int, tank: int) -> list:
+        # return enemy tank on the same column (position x is same)
+        pos_x = self.tanks[side][tank].x
+        pos_y = self.tanks[side][tank].y
+
+        enemy = 1 - side
+        for tank in self.tanks[enemy]:
+            if not tank.destroyed and tank.x == pos_x:
+                return [tank]
+        return []
+
+    def distanceToBrick(self, side: int,  tank: int) -> int:
+        pos_x = self.tanks[side][tank].x
+        pos_y = self.tanks[side][tank].y
+
+        min_dis = FIELD_HEIGHT
+        for y in range(FIELD_HEIGHT):
+            if (self.fieldContent[y][pos_x] and self.fieldContent[y][pos_x][0].itemType == FieldItemType.Brick):
+                min_dis = min(min_dis, abs(y - pos_y))
+        return min_dis
+
+    def distanceYToBase(self, side: int):
+        m = 9999
+        for tank in self.tanks[side]:
+            m = min(m, abs(tank.y - self.bases[1-side].y))
+        return m
+
+    def numBetweenTanks(self, side: int, tank1: int, tank2:FieldObject) -> int:
+        x = self.tanks[side][tank1].x
+        y1 = self.tanks[side][tank1].y
+        # y2 = self.tanks[1 - side][tank2].y
+        y2 = tank2.y
+
+        y_min = min(y1, y2)
+        y_max = max(y1, y2)
+
+        num = 0
+        for y in range(y_min, y_max):
+            if (self.fieldContent[y][x] and self.fieldContent[y][x][0].itemType == FieldItemType.Brick):
+                num += 1
+        return num
+
+    def getCloserToBase(self, side: int, tank: int, action: Action) -> bool:
+        if action == Action.Stay or action >= Action.UpShoot:
+            return False
+
+        target_x = self.bases[1 - side].x
+        target_y = self.bases[1 - side].y
+        pos_x = self.tanks[side][tank].x
+        pos_y = self.tanks[side][tank].y
+        x = pos_x + dx[action]
+        y = pos_y + dy[action]
+
+        if (x == FIELD_WIDTH // 2): return False
+        return self._dis_between(target_x, target_y, x, y) < self._dis_between(target_x, target_y, pos_x, pos_y)
+
+    def _dis_between(self, x1: int, y1: int, x2: int, y2: int) -> int:
+        return abs(x1 - x2) + abs(y1 - y2)
+
+    def allValid(self) -> bool:
+        for tanks in self.tanks:
+            for tank in tanks:
+                if not tank.destroyed and not self.actionValid(tank.side, tank.tankID, self.actions[tank.side][tank.tankID]):
+                    return False
+        return True
+
+    def inRange(self, x: int, y: int) -> bool:
+        return x >= 0 and x < FIELD_WIDTH and y >= 0 and y < FIELD_HEIGHT
+
+    def setActions(self, side: int, actions: List[int]) -> bool:
+        # the action of a destroyed tank doesn't matter, the same as allValid
+        for tank in range(TANK_PER_SIDE):
+            if not self.tanks[side][tank].destroyed and not self.actionValid(side, tank, actions[tank]):
+                return False
+        self.actions[side] = actions
+        return True
+
+    def doActions(self) -> bool:
+        if not self.allValid():
+            return False
+
+        self.lastActions = self.actions.copy()
+
+        for tanks in self.tanks:
+            for tank in tanks:
+                action = self.actions[tank.side][tank.tankID]
+                if not tank.destroyed and action >= Action.Up and action < Action.UpShoot:
+                    self.removeFieldItem(tank)
+                    tank.x = tank.x + dx[action]
+                    tank.y = tank.y + dy[action]
+                    self.insertFieldItem(tank)
+
+        itemsToBeDestroyed = set()
+
+        for tanks in self.tanks:
+            for tank in tanks:
+                action = self.actions[tank.side][tank.tankID]
+                if not tank.destroyed and action >= Action.UpShoot:
+                    action = action % 4
+                    multipleTankWithMe = len(self.fieldContent[tank.y][tank.x]) > 1
+                    for x, y in self.board.rays[tank.y][tank.x][action]:
+                        collides = self.fieldContent[y][x]
+                        if collides:
+                            if not multipleTankWithMe and len(collides) == 1 and collides[0].itemType == FieldItemType.Tank:
+                                oppAction = self.actions[collides[0].side][collides[0].tankID]
+                                if oppAction >= Action.UpShoot and action == (oppAction + 2) % 4:
+                                    break
+                            itemsToBeDestroyed.update(collides)
+                            break
+
+        for item in itemsToBeDestroyed:
+            if item.itemType != FieldItemType.Steel:
+                self.removeFieldItem(item)
+
+        self.currentTurn = self.currentTurn + 1
+        self.actions = [[Action.Invalid for t in range(TANK_PER_SIDE)] for s in range(SIDE_COUNT)]
+
+    def sideLose(self, side: int) -> bool:
+        return (self.tanks[side][0].destroyed and self.tanks[side][1].destroyed) or self.bases[side].destroyed
+
+    def whoWins(self) -> WhoWins:
+        fail = [self.sideLose(s) for s in range(SIDE_COUNT)]
+        if fail[0] == fail[1]:
+            return WhoWins.Draw if fail[0] or self.currentTurn > 100 else WhoWins.NotFinished
+        if fail[0]:
+            return WhoWins.Red
+        return WhoWins.Blue
+
+    def showPicture(self):
+        for y in range(FIELD_HEIGHT):
+            row = ""
+            for x in range(FIELD_WIDTH):
+                if not self.fieldContent[y][x]:
+                    # print ("0 ", file=sys.stderr)
+                    row = row + "0 "
+                else:
+                    # print (self.fieldContent[y][x][0].itemType, " ", file=sys.stderr)
+                    row = row + "{} ".format(self.fieldContent[y][x][0].itemType)
+            print (row, file=sys.stderr)
+
+# the debug entries of a turn sent with the response, the first ones and
+# the count of the others
+DEBUG_LIMIT = 8
+
+def summarizeDebug(debug, limit: int = DEBUG_LIMIT):
+    if not isinstance(debug, list) or len(debug) <= limit:
+        return debug
+    return debug[:limit] + [{'more': len(debug) - limit}]
+
+class BotzoneIO:
+    def __init__(self, longRunning = False):
+        self.longRunning = longRunning
+        self.mySide = -1
+        self.data = None
+        self.globaldata = None
+
+    def _processItem(self, field: TankField, item, isOpponent: bool):
+        if isinstance(item, dict):
+            self.mySide = item['mySide']
+            field.fromBinary(item['field'])
+        elif isOpponent:
+            field.setActions(1 - self.mySide, item)
+            field.doActions()
+        else:
+            field.setActions(self.mySide, item)
+
+    def readInput(self, field: TankField):
+        string = input()
+        # not counting the wait for the judge
+        with span('readInput'):
+            self.processInput(field, json.loads(string))
+
+    def processInput(self, field: TankField, obj):
+        # a request of the judge, from stdin or from the driver in-process
+        if 'requests' in obj:
+            requests = obj['requests']
+            responses = obj['responses']
+            n = len(requests)
+            for i in range(n):
+                self._processItem(field, requests[i], True)
+                if i < n - 1:
+                    self._processItem(field, responses[i], False)
+
+            if 'data' in obj:
+                self.data = obj['data']
+            if 'globaldata' in obj:
+                self.globaldata = obj['globaldata']
+        else:
+            self._processItem(field, obj, True)
+
+    def writeOutput(self, actions: List[Action], debug: str = None, data: str = None, globaldata: str = None, exitAfterOutput = False):
+        # a debug list is cut to DEBUG_LIMIT entries before it is serialized,
+        # the whole of it goes to the debug log of play()
+        print(json.dumps({
+            'response': actions,
+            'debug': summarizeDebug(debug),
+            'data': data,
+            'globaldata': globaldata
+        }))
+        if exitAfterOutput:
+            exit(0)
+        else:
+            print(">>>BOTZONE_REQUEST_KEEP_RUNNING<<<")
+            sys.stdout.flush()
+
+# the tracer of tracer.py recording the spans of this process, if any. The
+# engine doesn't import tracer.py, a bot uploaded to Botzone never traces.
+activeTracer = None
+
+class NoSpan:
+    # contextlib.nullcontext, without importing contextlib at startup
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+NO_SPAN = NoSpan()
+TRACE_ENV = 'TANK_TRACE'
+PROFILE_ENV = 'TANK_PROFILE'
+DEBUG_ENV = 'TANK_DEBUG'
+# the file descriptor of the shared memory of a bot started by the driver
+# with the shmring.py transport, and the transport the driver uses
+SHM_ENV = 'TANK_SHM'
+TRANSPORT_ENV = 'TANK_TRANSPORT'
+
+def span(name: str, **args):
+    return activeTracer.span(name, **args) if activeTracer else NO_SPAN
+
+class State:
+    # what a strategy keeps between the turns of a game. The runner clears
+    # `debug` before each turn and outputs it, strategies may add their
+    # own attributes. `globaldata` is the string Botzone keeps for the bot
+    # across games, None if there is none: the runner sets it from the
+    # request that has it and outputs it after every turn, see globalcache.py.
+    def __init__(self, rng = random):
+        self.rng = rng
+        self.debug = []
+        self.globaldata = None
+
+def is_shoot(action):
+    return action in [Action.DownShoot, Action.UpShoot, Action.LeftShoot, Action.RightShoot]
+
+def play(decide, state: State = None):
+    # runs a strategy as a long-running Botzone bot, traced into the
+    # directory $TANK_TRACE if set (see drive.py --trace), profiled into
+    # $TANK_PROFILE (see profiling.py) and its full debug output logged
+    # into $TANK_DEBUG (see debuglog.py). Started by the driver with
+    # $TANK_SHM, it is a worker of shmring.py instead.
+    if os.environ.get(TRACE_ENV):
+        import tracer
+        tracer.start(os.path.join(os.environ[TRACE_ENV], '{}.json'.format(os.getpid())))
+    profiler = None
+    if os.environ.get(PROFILE_ENV):
+        import profiling
+        profiler = profiling.Profiler(os.environ[PROFILE_ENV])
+    debugLog = None
+    if os.environ.get(DEBUG_ENV):
+        import debuglog
+        debugLog = debuglog.start(os.environ[DEBUG_ENV])
+    state = state or State()
+    if os.environ.get(SHM_ENV):
+        import shmring
+        shmring.serve(decide, state, profiler, debugLog)
+        return
+    field = TankField()
+    io = BotzoneIO()
+    while True:
+        try:
+            io.readInput(field)
+        except EOFError:
+            # the driver closed stdin, the last chance to save the profile
+            break
+        if state.globaldata is None:
+            state.globaldata = io.globaldata
+        state.debug = []
+        with span('decide', turn=field.currentTurn), profiler or NO_SPAN:
+            myActions = decide(field, io.mySide, state)
+        io.writeOutput(myActions, state.debug, io.data, state.globaldata, False)
+        if debugLog:
+            debugLog.write(field.currentTurn, io.mySide, state.debug)
+        field.setActions(io.mySide, myActions)
+    if profiler:
+        profiler.save()
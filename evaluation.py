@@ -0,0 +1,134 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from engine import FIELD_HEIGHT, FIELD_WIDTH, SIDE_COUNT, TANK_PER_SIDE, FieldItemType
+
+# Position evaluation of a TankField, kept up to date from the items the
+# field inserts and removes instead of scanning the board. The bricks of
+# each column are a 9 bit mask (bit y), a brick or tank that changes marks
+# the tanks whose features depend on its column, and score() refreshes
+# at most those four tanks.
+
+FEATURES = ['alive', 'distanceY', 'brickDistance', 'enemyOnColumn', 'openLine']
+
+# the score is from blue's view, a feature of a red tank counts negatively
+WEIGHTS = {
+    'alive': 10.0,
+    'distanceY': -1.0,
+    'brickDistance': 0.1,
+    'enemyOnColumn': -0.5,
+    'openLine': -2.0,
+    'base': 1000.0,
+}
+
+def _nearest(mask: int, y: int) -> int:
+    distance = FIELD_HEIGHT
+    for yi in range(FIELD_HEIGHT):
+        if mask >> yi & 1:
+            distance = min(distance, abs(yi - y))
+    return distance
+
+# NEAREST[mask][y]: the distance from y to the nearest brick of a column
+NEAREST = [[_nearest(mask, y) for y in range(FIELD_HEIGHT)] for mask in range(1 << FIELD_HEIGHT)]
+# BETWEEN[y1][y2]: the cells strictly between y1 and y2
+BETWEEN = [[((1 << max(y1, y2)) - 1) & ~((1 << (min(y1, y2) + 1)) - 1) for y2 in range(FIELD_HEIGHT)] for y1 in range(FIELD_HEIGHT)]
+POPCOUNT = [bin(mask).count('1') for mask in range(1 << FIELD_HEIGHT)]
+
+class Evaluator:
+
+    def __init__(self, field, weights: dict = None):
+        self.field = field
+        self.weights = dict(WEIGHTS, **(weights or {}))
+        self.reset()
+        field.observers.append(self)
+
+    def detach(self):
+        self.field.observers.remove(self)
+
+    def fork(self, field) -> 'Evaluator':
+        # the evaluator of `field`, a clone of ours, from our features rather
+        # than from its board: a leaf of a lookahead costs its changes only
+        evaluator = Evaluator.__new__(Evaluator)
+        evaluator.field = field
+        evaluator.weights = self.weights
+        evaluator.columns = list(self.columns)
+        evaluator.features = [[list(features) for features in tanks] for tanks in self.features]
+        evaluator.values = [list(values) for values in self.values]
+        evaluator.value = self.value
+        evaluator.dirty = set(self.dirty)
+        field.observers.append(evaluator)
+        return evaluator
+
+    def reset(self):
+        # rebuilds everything from the board, needed only if the field was
+        # changed without insertFieldItem/removeFieldItem (fromMatrix)
+        self.columns = [0] * FIELD_WIDTH
+        for y in range(FIELD_HEIGHT):
+            for x in range(FIELD_WIDTH):
+                cell = self.field.fieldContent[y][x]
+                if cell and cell[0].itemType == FieldItemType.Brick:
+                    self.columns[x] |= 1 << y
+        self.features = [[[0] * len(FEATURES) for t in range(TANK_PER_SIDE)] for s in range(SIDE_COUNT)]
+        self.values = [[0.0] * TANK_PER_SIDE for s in range(SIDE_COUNT)]
+        self.value = 0.0
+        self.dirty = set((s, t) for s in range(SIDE_COUNT) for t in range(TANK_PER_SIDE))
+
+    def itemInserted(self, item):
+        if item.itemType == FieldItemType.Brick:
+            self.columns[item.x] |= 1 << item.y
+        self._touch(item)
+
+    def itemRemoved(self, item):
+        if item.itemType == FieldItemType.Brick:
+            self.columns[item.x] &= ~(1 << item.y)
+        self._touch(item)
+
+    def _touch(self, item):
+        if item.itemType == FieldItemType.Tank:
+            self.dirty.add((item.side, item.tankID))
+        for tanks in self.field.tanks:
+            for tank in tanks:
+                if tank.x == item.x:
+                    self.dirty.add((tank.side, tank.tankID))
+
+    def _update(self, side: int, tank: int):
+        me = self.field.tanks[side][tank]
+        features = self.features[side][tank]
+        if me.destroyed:
+            features[:] = [0] * len(FEATURES)
+        else:
+            column = self.columns[me.x]
+            enemies = [k for k in self.field.tanks[1 - side] if not k.destroyed and k.x == me.x]
+            features[0] = 1
+            features[1] = abs(me.y - self.field.bases[1 - side].y)
+            features[2] = NEAREST[column][me.y]
+            features[3] = len(enemies)
+            features[4] = sum(1 for k in enemies if not column & BETWEEN[me.y][k.y])
+        value = sum(self.weights[name] * feature for name, feature in zip(FEATURES, features))
+        if side == 1:
+            value = -value
+        self.value += value - self.values[side][tank]
+        self.values[side][tank] = value
+
+    def refresh(self):
+        while self.dirty:
+            self._update(*self.dirty.pop())
+
+    def score(self, side: int = 0) -> float:
+        self.refresh()
+        value = self.value + self.weights['base'] * (self.field.bases[1].destroyed - self.field.bases[0].destroyed)
+        return value if side == 0 else -value
+
+    # cached versions of the TankField queries of the same name
+
+    def distanceToBrick(self, side: int, tank: int) -> int:
+        self.refresh()
+        return self.features[side][tank][2]
+
+    def numBetweenTanks(self, side: int, tank1: int, tank2) -> int:
+        me = self.field.tanks[side][tank1]
+        return POPCOUNT[self.columns[me.x] & BETWEEN[me.y][tank2.y]]
+
+    def distanceYToBase(self, side: int) -> int:
+        base = self.field.bases[1 - side]
+        return min(abs(tank.y - base.y) for tank in self.field.tanks[side])
@@ -0,0 +1,386 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import importlib
+import itertools
+import json
+import random
+import sys
+import time
+
+import endgame
+import evaluation
+import mapgen
+from engine import FIELD_WIDTH, SIDE_COUNT, TANK_PER_SIDE, Action, TankField, WhoWins
+from safety import SafetySearch
+from symmetry import brickBits, canonicalKey, mirrorActions, rotateField
+
+# Differential tests of the fast engines against TankField.doActions. The
+# reference and a candidate play the same random games, a random valid
+# action for every tank each turn, on random maps, and their states are
+# compared after every turn. The trace of a game where they differ is
+# shrunk, turns removed, actions made Stay, bricks removed, as long as it
+# still fails, and printed as JSON with the map and the actions. The
+# safety candidate checks the claims of safety.py the same way, the
+# evaluation one the features evaluation.py keeps up to date, and the
+# symmetry one the rotations of symmetry.py.
+#
+# A candidate is a class with
+#   tanks: the tanks per side it plays, the others are removed at the start
+#   reset(field, rng): the position to start from, the reference's own
+#   step(actions): plays a turn, the actions of both sides
+#   compare(field) -> None, or what differs from the reference after it
+#   done: True once the candidate can't follow the game any further
+# given by name, or as module:Class.
+
+# the probability of a shot in the random games: fewer shots than uniform
+# actions make longer games with more tanks sharing a cell
+SHOOT = 0.2
+
+def snapshot(field) -> tuple:
+    # everything doActions changes
+    cells = tuple(tuple(sorted((item.itemType, getattr(item, 'side', -1), getattr(item, 'tankID', -1)) for item in cell))
+                  for row in field.fieldContent for cell in row)
+    tanks = tuple((tank.x, tank.y, tank.destroyed) for tanks in field.tanks for tank in tanks)
+    bases = tuple(base.destroyed for base in field.bases)
+    return cells, tanks, bases, tuple(map(tuple, field.lastActions)), field.currentTurn, field.whoWins()
+
+def difference(expected: tuple, actual: tuple) -> str:
+    names = ['cells', 'tanks', 'bases', 'lastActions', 'currentTurn', 'whoWins']
+    errors = []
+    for name, a, b in zip(names, expected, actual):
+        if name == 'cells':
+            errors.extend('cell ({}, {}): {} != {}'.format(cell % FIELD_WIDTH, cell // FIELD_WIDTH, a[cell], b[cell])
+                          for cell in range(len(a)) if a[cell] != b[cell])
+        elif a != b:
+            errors.append('{}: {} != {}'.format(name, a, b))
+    return ', '.join(errors)
+
+def randomActions(field, rng, shoot: float = SHOOT) -> list:
+    # a shot with probability `shoot` if the tank can shoot, else a move or Stay
+    actions = []
+    for side in range(SIDE_COUNT):
+        actions.append([])
+        for tank in range(TANK_PER_SIDE):
+            valid = [action for action in range(Action.Stay, Action.LeftShoot + 1) if field.actionValid(side, tank, action)]
+            shots = [action for action in valid if action >= Action.UpShoot]
+            moves = [action for action in valid if action < Action.UpShoot]
+            if field.tanks[side][tank].destroyed:
+                actions[side].append(Action.Stay)
+            else:
+                actions[side].append(rng.choice(shots if shots and rng.random() < shoot else moves))
+    return actions
+
+class CloneEngine:
+    # TankField.clone(): each turn is played on a fork of the field, while
+    # the parent plays other actions that must not leak into the fork
+    tanks = TANK_PER_SIDE
+    done = False
+
+    def reset(self, field, rng):
+        self.field = field.clone()
+        self.rng = rng
+
+    def step(self, actions):
+        parent, self.field = self.field, self.field.clone()
+        for side in range(SIDE_COUNT):
+            self.field.setActions(side, actions[side])
+        self.field.doActions()
+        if parent.whoWins() == WhoWins.NotFinished:
+            decoy = randomActions(parent, self.rng)
+            for side in range(SIDE_COUNT):
+                parent.setActions(side, decoy[side])
+            parent.doActions()
+
+    def compare(self, field):
+        expected, actual = snapshot(field), snapshot(self.field)
+        return difference(expected, actual) if expected != actual else None
+
+class EndgameEngine:
+    # endgame.Layout.step(), one tank per side, until the game leaves the
+    # table: a win, both sides losing, or a brick broken
+    tanks = 1
+
+    def reset(self, field, rng):
+        self.layout = endgame.Layout(brickBits(field))
+        blue, red = field.tanks[0][0], field.tanks[1][0]
+        self.cells = [blue.y * FIELD_WIDTH + blue.x, red.y * FIELD_WIDTH + red.x]
+        self.outcome = endgame.stateIndex(self.cells[0], self.cells[1], False, False)
+        self.done = False
+
+    def step(self, actions):
+        blue, red = actions[0][0], actions[1][0]
+        self.outcome = self.layout.step(self.cells[0], self.cells[1], blue, red)
+        for side, action in enumerate([blue, red]):
+            if Action.Up <= action < Action.UpShoot:
+                self.cells[side] = self.layout.neighbors[self.cells[side]][action]
+        self.done = self.outcome >= endgame.STATES
+
+    def compare(self, field):
+        winner = field.whoWins()
+        if self.outcome == endgame.BLUE_WINS or self.outcome == endgame.RED_WINS:
+            expected = WhoWins.Blue if self.outcome == endgame.BLUE_WINS else WhoWins.Red
+            return None if winner == expected else 'table: side {} wins, whoWins {}'.format(expected, winner)
+        bricksBroken = brickBits(field) != self.layout.bricks
+        if self.outcome == endgame.UNKNOWN:
+            return None if winner == WhoWins.Draw or bricksBroken else 'table: unknown, whoWins {}'.format(winner)
+        if bricksBroken:
+            return 'table: a position, a brick broke'
+        if winner != WhoWins.NotFinished and not (winner == WhoWins.Draw and field.currentTurn > endgame.MAX_TURN):
+            return 'table: a position, whoWins {}'.format(winner)
+        blue, red = field.tanks[0][0], field.tanks[1][0]
+        index = endgame.stateIndex(blue.y * FIELD_WIDTH + blue.x, red.y * FIELD_WIDTH + red.x,
+                                   field.lastActions[0][0] >= Action.UpShoot, field.lastActions[1][0] >= Action.UpShoot)
+        return None if index == self.outcome else 'table: position {}, field {}'.format(self.outcome, index)
+
+def survives(field, side: int, tank: int, action: int, depth: int) -> bool:
+    # if `action` keeps our tank alive for `depth` turns whatever the enemy
+    # tanks do, our other tank staying: by doActions on clones
+    def valid(field, side, tank):
+        if field.tanks[side][tank].destroyed:
+            return [Action.Stay]
+        return [a for a in range(Action.Stay, Action.LeftShoot + 1) if field.actionValid(side, tank, a)]
+    mine = [Action.Stay] * TANK_PER_SIDE
+    mine[tank] = action
+    for theirs in itertools.product(*(valid(field, 1 - side, t) for t in range(TANK_PER_SIDE))):
+        after = field.clone()
+        after.setActions(side, mine)
+        after.setActions(1 - side, list(theirs))
+        after.doActions()
+        if after.tanks[side][tank].destroyed:
+            return False
+        if depth > 1 and not any(survives(after, side, tank, a, depth - 1) for a in valid(after, side, tank)):
+            return False
+    return True
+
+class SafetyCheck:
+    # safety.SafetySearch against survives(): each turn, a random action that
+    # the search finds safe for DEPTH turns, of a random tank within reach
+    # of an enemy tank. A few seconds a game, run it with few games.
+    tanks = TANK_PER_SIDE
+    done = False
+    DEPTH = 2
+
+    def reset(self, field, rng):
+        self.rng = rng
+
+    def step(self, actions):
+        pass
+
+    def compare(self, field):
+        if field.whoWins() != WhoWins.NotFinished:
+            return None
+        side, tank = self.rng.randrange(SIDE_COUNT), self.rng.randrange(TANK_PER_SIDE)
+        me = field.tanks[side][tank]
+        if me.destroyed or all(enemy.destroyed or min(abs(enemy.x - me.x), abs(enemy.y - me.y)) >= 2 * self.DEPTH
+                               for enemy in field.tanks[1 - side]):
+            return None
+        safe = SafetySearch(field, side).safeActions(tank, self.DEPTH)
+        if not safe:
+            return None
+        action = self.rng.choice(safe)
+        if survives(field, side, tank, action, self.DEPTH):
+            return None
+        return 'safety: tank {} of side {} may be destroyed within {} turns after {}'.format(tank, side, self.DEPTH, action)
+
+class EvaluationCheck:
+    # evaluation.Evaluator updated by the moves of the game, forked onto a
+    # clone each turn as a lookahead does, against an evaluator built from
+    # the board and the queries of TankField
+    tanks = TANK_PER_SIDE
+    done = False
+
+    def reset(self, field, rng):
+        self.field = field.clone()
+        self.evaluator = evaluation.Evaluator(self.field)
+
+    def step(self, actions):
+        self.field = self.field.clone()
+        evaluator, self.evaluator = self.evaluator, self.evaluator.fork(self.field)
+        evaluator.detach()
+        for side in range(SIDE_COUNT):
+            self.field.setActions(side, actions[side])
+        self.field.doActions()
+
+    def compare(self, field):
+        errors = []
+        expected = evaluation.Evaluator(field.clone())
+        if abs(self.evaluator.score() - expected.score()) > 1e-9:
+            errors.append('score: {} != {}'.format(expected.score(), self.evaluator.score()))
+        for side in range(SIDE_COUNT):
+            for tank in range(TANK_PER_SIDE):
+                if field.tanks[side][tank].destroyed:
+                    continue
+                if self.evaluator.distanceToBrick(side, tank) != field.distanceToBrick(side, tank):
+                    errors.append('distanceToBrick of tank {} of side {}: {} != {}'.format(
+                        tank, side, field.distanceToBrick(side, tank), self.evaluator.distanceToBrick(side, tank)))
+                for enemy in field.enemyTankOnSameColumn(side, tank):
+                    if self.evaluator.numBetweenTanks(side, tank, enemy) != field.numBetweenTanks(side, tank, enemy):
+                        errors.append('numBetweenTanks of tank {} of side {}: {} != {}'.format(
+                            tank, side, field.numBetweenTanks(side, tank, enemy),
+                            self.evaluator.numBetweenTanks(side, tank, enemy)))
+        return ', '.join(errors) or None
+
+class SymmetryCheck:
+    # the claims of symmetry.py: a position seen by a side and its rotation
+    # seen by the other have the same canonical key and the same safe
+    # actions of safety.py, mirrored
+    tanks = TANK_PER_SIDE
+    done = False
+    DEPTH = 2
+
+    def reset(self, field, rng):
+        pass
+
+    def step(self, actions):
+        pass
+
+    def compare(self, field):
+        if field.whoWins() != WhoWins.NotFinished:
+            return None
+        rotated = rotateField(field)
+        errors = []
+        for side in range(SIDE_COUNT):
+            if canonicalKey(field, side) != canonicalKey(rotated, 1 - side):
+                errors.append('key of side {}'.format(side))
+            for tank in range(TANK_PER_SIDE):
+                expected = sorted(SafetySearch(field, side).safeActions(tank, self.DEPTH))
+                actual = sorted(mirrorActions(SafetySearch(rotated, 1 - side).safeActions(tank, self.DEPTH)))
+                if expected != actual:
+                    errors.append('safe actions of tank {} of side {}: {} != {}'.format(tank, side, expected, actual))
+        return ', '.join(errors) or None
+
+CANDIDATES = {
+    'clone': CloneEngine,
+    'endgame': EndgameEngine,
+    'evaluation': EvaluationCheck,
+    'safety': SafetyCheck,
+    'symmetry': SymmetryCheck,
+}
+
+def load_candidate(name: str):
+    if name in CANDIDATES:
+        return CANDIDATES[name]
+    if ':' not in name:
+        raise KeyError('unknown candidate {}, one of {} or module:Class'.format(name, ', '.join(sorted(CANDIDATES))))
+    module, cls = name.split(':')
+    return getattr(importlib.import_module(module), cls)
+
+def start(bricks, tanks: int) -> TankField:
+    field = TankField()
+    field.fromBinary(bricks)
+    for side in range(SIDE_COUNT):
+        for tank in field.tanks[side][tanks:]:
+            field.removeFieldItem(tank)
+    return field
+
+class Timer:
+    # seconds of the reference and the candidate over the turns both played
+    def __init__(self):
+        self.seconds = {'reference': 0.0, 'candidate': 0.0}
+        self.turns = 0
+
+    def time(self, name, function, *args):
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+def replay(cls, bricks, trace, seed: int = 0, timer: Timer = None):
+    # (turn, error) of the first turn after which the candidate differs,
+    # None if it doesn't or the trace isn't valid for the reference
+    timer = timer or Timer()
+    field = start(bricks, cls.tanks)
+    candidate = cls()
+    candidate.reset(field.clone(), random.Random(seed))
+    for turn, actions in enumerate(trace):
+        if field.whoWins() != WhoWins.NotFinished or candidate.done:
+            return None
+        if not all(field.setActions(side, actions[side]) for side in range(SIDE_COUNT)):
+            return None
+        timer.time('reference', field.doActions)
+        timer.turns += 1
+        try:
+            timer.time('candidate', candidate.step, actions)
+            error = candidate.compare(field)
+        except Exception as e:
+            error = '{}: {}'.format(type(e).__name__, e)
+        if error:
+            return turn, error
+    return None
+
+def play(cls, bricks, rng, seed: int, timer: Timer, shoot: float = SHOOT):
+    # a random game, its trace and (turn, error) if the candidate differs
+    field = start(bricks, cls.tanks)
+    trace = []
+    while field.whoWins() == WhoWins.NotFinished:
+        trace.append(randomActions(field, rng, shoot))
+        for side in range(SIDE_COUNT):
+            field.setActions(side, trace[-1][side])
+        field.doActions()
+    return trace, replay(cls, bricks, trace, seed, timer)
+
+def shrink(cls, bricks, trace, seed: int):
+    # a shorter trace on fewer bricks that still fails, greedily
+    def fails(bricks, trace):
+        return replay(cls, bricks, trace, seed) is not None
+    trace = trace[:replay(cls, bricks, trace, seed)[0] + 1]
+    changed = True
+    while changed:
+        changed = False
+        for turn in reversed(range(len(trace))):
+            shorter = trace[:turn] + trace[turn + 1:]
+            if shorter and fails(bricks, shorter):
+                trace, changed = shorter, True
+        for turn in range(len(trace)):
+            for side in range(SIDE_COUNT):
+                for tank in range(TANK_PER_SIDE):
+                    if trace[turn][side][tank] != Action.Stay:
+                        simpler = [list(map(list, actions)) for actions in trace]
+                        simpler[turn][side][tank] = Action.Stay
+                        if fails(bricks, simpler):
+                            trace, changed = simpler, True
+        value = mapgen.pack(bricks)
+        for cell in range(mapgen.CELLS):
+            if value >> cell & 1 and fails(mapgen.unpack(value & ~(1 << cell)), trace):
+                value &= ~(1 << cell)
+                changed = True
+        bricks = mapgen.unpack(value)
+        trace = trace[:replay(cls, bricks, trace, seed)[0] + 1]
+    return bricks, trace
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compare a fast engine with TankField.doActions on random games.')
+    parser.add_argument('candidate', help='one of {}, or module:Class'.format(', '.join(sorted(CANDIDATES))))
+    parser.add_argument('-n', '--games', type=int, default=500, help='number of games')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the maps and actions')
+    parser.add_argument('--density', type=float, default=0.3, help='share of the cells that are bricks')
+    parser.add_argument('--shoot', type=float, default=SHOOT, help='probability of a shot in the random games')
+    parser.add_argument('--failures', type=int, default=1, help='stop after this many failing games')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    try:
+        cls = load_candidate(args.candidate)
+    except KeyError as e:
+        sys.exit(e.args[0])
+    rng = random.Random(args.seed)
+    timer = Timer()
+    failures = 0
+    for game in range(args.games):
+        bricks = mapgen.generate(rng, args.density)
+        trace, failure = play(cls, bricks, rng, game, timer, args.shoot)
+        if failure:
+            failures += 1
+            shrunk, shortTrace = shrink(cls, bricks, trace, game)
+            turn, error = replay(cls, shrunk, shortTrace, game)
+            print(json.dumps({'game': game, 'map': shrunk, 'actions': shortTrace, 'error': error}))
+            if failures >= args.failures:
+                break
+    reference, candidate, turns = timer.seconds['reference'], timer.seconds['candidate'], timer.turns
+    print('{} games, {} turns compared, {} failing'.format(game + 1, turns, failures))
+    print('reference {:.1f} us/turn, candidate {:.1f} us/turn, speedup {:.2f}x'.format(
+        reference / turns * 1e6, candidate / turns * 1e6, reference / candidate if candidate else float('inf')))
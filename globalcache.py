@@ -0,0 +1,80 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+from collections import OrderedDict
+
+# What a bot learns across games, kept in the globaldata of Botzone: a
+# string the judge gives back at the start of each game with what the
+# bot output last. The cache is a JSON list of [key, value] pairs, least
+# recently used first. It is parsed on its first use, not at startup, and
+# written back only if it changed, dropping the least recently used
+# entries until it fits in LIMIT characters. Values are JSON lists or
+# numbers and must stay small, the keys of the bots:
+#   "enemy": statistics of the enemy bots, all of them as Botzone doesn't
+#            tell who the opponent is, halved now and then to follow the
+#            recent ones
+#   "map:<hex of the bricks>": the same statistics on one map
+
+# characters of globaldata, well under what Botzone stores for a bot
+LIMIT = 16384
+
+class GlobalCache:
+
+    def __init__(self, text: str = None, limit: int = LIMIT):
+        self.text = text
+        self.limit = limit
+        self.entries = None
+        # the JSON of the entries not changed since, a dump only encodes
+        # the others
+        self.encoded = {}
+        self.changed = False
+
+    def _load(self):
+        if self.entries is None:
+            self.entries = OrderedDict()
+            try:
+                for key, value in json.loads(self.text or '[]'):
+                    self.entries[key] = value
+            except (ValueError, TypeError):
+                pass # not ours or damaged, start again
+
+    def get(self, key: str, default=None):
+        self._load()
+        if key not in self.entries:
+            return default
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key: str, value):
+        self._load()
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        self.encoded.pop(key, None)
+        self.changed = True
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self.entries)
+
+    def dumps(self) -> str:
+        # the globaldata to output, the text read if nothing changed
+        if not self.changed:
+            return self.text
+        parts = []
+        for key, value in self.entries.items():
+            if key not in self.encoded:
+                self.encoded[key] = json.dumps([key, value], separators=(',', ':'))
+            parts.append(self.encoded[key])
+        # the brackets and the commas
+        size = sum(map(len, parts)) + len(parts) + 1
+        dropped = 0
+        while size > self.limit and dropped < len(parts):
+            size -= len(parts[dropped]) + 1
+            dropped += 1
+        for key in list(self.entries)[:dropped]:
+            del self.entries[key]
+            del self.encoded[key]
+        self.text = '[' + ','.join(parts[dropped:]) + ']'
+        self.changed = False
+        return self.text
@@ -0,0 +1,90 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import random
+
+from engine import FIELD_HEIGHT, FIELD_WIDTH
+
+# A map is the `field` of the first request: three 27 bit integers, bit
+# (y % 3 * 9 + x) of the (y // 3)-th one is set if (x, y) is a brick, see
+# to_binary in drive.py and TankField.fromBinary. Joined into one 81 bit
+# integer, bit (y * 9 + x) is the cell (x, y), and rotating the field by
+# 180 degrees, which swaps the two sides, maps bit i to bit 80 - i.
+
+CELLS = FIELD_HEIGHT * FIELD_WIDTH
+ROW_BITS = 27
+ROW_MASK = (1 << ROW_BITS) - 1
+RECORD_SIZE = (CELLS + 7) // 8
+
+# bases, steel and the cells where the tanks spawn
+RESERVED = [(4, 0), (4, 1), (2, 0), (6, 0)]
+RESERVED = RESERVED + [(FIELD_WIDTH - 1 - x, FIELD_HEIGHT - 1 - y) for x, y in RESERVED]
+
+def _pairs():
+    reserved = set(y * FIELD_WIDTH + x for x, y in RESERVED)
+    pairs = []
+    for i in range(CELLS // 2 + 1):
+        if i not in reserved:
+            pairs.append((1 << i) | (1 << (CELLS - 1 - i)))
+    return pairs
+
+PAIRS = _pairs()
+
+def pack(bricks) -> int:
+    return bricks[0] | (bricks[1] << ROW_BITS) | (bricks[2] << (2 * ROW_BITS))
+
+def unpack(value: int):
+    return [(value >> (i * ROW_BITS)) & ROW_MASK for i in range(3)]
+
+def rotate(value: int) -> int:
+    return int(format(value, '0{}b'.format(CELLS))[::-1], 2)
+
+def generate(rng=random, density: float = 0.3):
+    value = 0
+    for pair in PAIRS:
+        if rng.random() < density:
+            value |= pair
+    return unpack(value)
+
+def to_grid(bricks):
+    value = pack(bricks)
+    return [[(value >> (y * FIELD_WIDTH + x)) & 1 for x in range(FIELD_WIDTH)] for y in range(FIELD_HEIGHT)]
+
+def write_corpus(path: str, maps):
+    with open(path, 'wb') as f:
+        for bricks in maps:
+            f.write(pack(bricks).to_bytes(RECORD_SIZE, 'little'))
+
+def load_corpus(path: str):
+    with open(path, 'rb') as f:
+        data = f.read()
+    return [unpack(int.from_bytes(data[i:i + RECORD_SIZE], 'little')) for i in range(0, len(data), RECORD_SIZE)]
+
+def generate_corpus(count: int, seed: int = None, density: float = 0.3):
+    rng = random.Random(seed)
+    seen = set()
+    maps = []
+    while len(maps) < count:
+        bricks = generate(rng, density)
+        if pack(bricks) not in seen:
+            seen.add(pack(bricks))
+            maps.append(bricks)
+    return maps
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Generate a corpus of random symmetric Tank maps.')
+    parser.add_argument('-o', '--output', default='maps.bin', help='file of the corpus')
+    parser.add_argument('-n', '--count', type=int, default=10000, help='number of distinct maps')
+    parser.add_argument('--seed', type=int, help='seed of the generator')
+    parser.add_argument('--density', type=float, default=0.3, help='probability of a brick in a free cell')
+    parser.add_argument('--show', type=int, default=0, help='print the first SHOW maps of the corpus')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    write_corpus(args.output, generate_corpus(args.count, args.seed, args.density))
+    for bricks in load_corpus(args.output)[:args.show]:
+        print(bricks)
+        for row in to_grid(bricks):
+            print(' '.join(str(cell) for cell in row))
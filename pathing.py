@@ -0,0 +1,86 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import heapq
+
+from engine import FIELD_HEIGHT, FIELD_WIDTH, FieldItemType
+
+# The shortest routes of a tank in turns, by A*. A step to an empty cell
+# costs a turn, a step into a brick BRICK_COST: the shot that breaks it
+# and the move, which is also the cooldown before the next shot. Steel
+# and the bases can't be crossed, tanks are ignored as they move. Routes
+# go to a row, the one of the enemy base where shootBase() takes over,
+# and are cached by (start, row, bricks): a route is valid as long as no
+# brick breaks, and its suffixes are the routes from the cells it crosses.
+
+BRICK_COST = 2
+
+# the cached routes before the cache is emptied, bricks only break so the
+# routes of older layouts are of no use
+CAPACITY = 4096
+
+class PathPlanner:
+
+    def __init__(self):
+        self.routes = {}
+        self.hits = self.misses = 0
+
+    def layout(self, field) -> int:
+        # the bricks as a bit mask of the cells
+        bricks = 0
+        for y in range(FIELD_HEIGHT):
+            row = field.fieldContent[y]
+            for x in range(FIELD_WIDTH):
+                if row[x] and row[x][0].itemType == FieldItemType.Brick:
+                    bricks |= 1 << (y * FIELD_WIDTH + x)
+        return bricks
+
+    def route(self, field, x: int, y: int, row: int):
+        # the cells from (x, y) to the nearest cell of `row`, (x, y)
+        # excluded, or None if none can be reached
+        bricks = self.layout(field)
+        key = ((x, y), row, bricks)
+        if key in self.routes:
+            self.hits += 1
+            return self.routes[key]
+        self.misses += 1
+        route = self._search(field, (x, y), row, bricks)
+        if len(self.routes) >= CAPACITY:
+            self.routes = {}
+        self.routes[key] = route
+        if route:
+            for i, cell in enumerate(route[:-1]):
+                self.routes[(cell, row, bricks)] = route[i + 1:]
+        return route
+
+    def _search(self, field, start, row: int, bricks: int):
+        neighbors = field.board.neighbors
+        cost = {start: 0}
+        parent = {start: None}
+        frontier = [(abs(start[1] - row), 0, start)]
+        while frontier:
+            _, g, cell = heapq.heappop(frontier)
+            if g > cost[cell]:
+                continue
+            if cell[1] == row:
+                route = []
+                while cell != start:
+                    route.append(cell)
+                    cell = parent[cell]
+                return route[::-1]
+            for nxt in neighbors[cell[1]][cell[0]]:
+                if nxt is None:
+                    continue
+                x, y = nxt
+                content = field.fieldContent[y][x]
+                if bricks >> (y * FIELD_WIDTH + x) & 1:
+                    step = BRICK_COST
+                elif content and content[0].itemType in (FieldItemType.Steel, FieldItemType.Base):
+                    continue
+                else:
+                    step = 1
+                if g + step < cost.get(nxt, g + step + 1):
+                    cost[nxt] = g + step
+                    parent[nxt] = cell
+                    heapq.heappush(frontier, (g + step + abs(y - row), g + step, nxt))
+        return None
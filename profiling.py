@@ -0,0 +1,190 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from engine import PROFILE_ENV
+
+# Profiles of the decisions of the bots, switched on by $TANK_PROFILE, a
+# directory. Only decide() is profiled, each turn adds to the profile of
+# the process, which is written when the bot shuts down cleanly to
+# <directory>/<pid>.pstats (cProfile) or <pid>.collapsed (sampling, one
+# "caller;callee count" line per stack, for flamegraph.pl or speedscope). The driver gives each bot a subdirectory
+# named after it and collect() merges the files of a subdirectory into
+# <directory>/<bot>.pstats or .collapsed, across all the games of a run.
+
+MODE_ENV = 'TANK_PROFILE_MODE'
+MODES = ['cprofile', 'sample']
+
+# seconds between two samples
+SAMPLE_INTERVAL = 0.001
+
+class DeterministicProfiler:
+    suffix = '.pstats'
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def __enter__(self):
+        self.profile.enable()
+
+    def __exit__(self, *exc):
+        self.profile.disable()
+
+    def save(self, path: str):
+        self.profile.dump_stats(path)
+
+class SamplingProfiler:
+    # a thread that records the stack of the profiled thread every
+    # `interval` seconds while it is inside a `with` block
+    suffix = '.collapsed'
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts = Counter()
+        self.target = None
+        self.active = False
+        # the sampler only runs when the profiled thread lets the GIL go
+        sys.setswitchinterval(min(sys.getswitchinterval(), interval))
+        threading.Thread(target=self._sample, daemon=True).start()
+
+    def __enter__(self):
+        self.target = threading.get_ident()
+        self.active = True
+
+    def __exit__(self, *exc):
+        self.active = False
+
+    def _sample(self):
+        while True:
+            time.sleep(self.interval)
+            if not self.active:
+                continue
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                stack.append('{}:{}'.format(os.path.basename(frame.f_code.co_filename), frame.f_code.co_name))
+                frame = frame.f_back
+            self.counts[';'.join(reversed(stack))] += 1
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            for stack, count in list(self.counts.items()):
+                f.write('{} {}\n'.format(stack, count))
+
+class Profiler:
+    # the profile of one bot in this process, saved to `directory`
+    def __init__(self, directory: str, mode: str = None):
+        mode = mode or os.environ.get(MODE_ENV) or MODES[0]
+        if mode not in MODES:
+            raise ValueError('unknown profile mode {}, one of {}'.format(mode, ', '.join(MODES)))
+        self.profiler = DeterministicProfiler() if mode == 'cprofile' else SamplingProfiler()
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, '{}{}'.format(os.getpid(), self.profiler.suffix))
+
+    def __enter__(self):
+        self.profiler.__enter__()
+
+    def __exit__(self, *exc):
+        self.profiler.__exit__(*exc)
+
+    def save(self):
+        # replaced at once, a reader never sees half a file
+        self.profiler.save(self.path + '.tmp')
+        os.replace(self.path + '.tmp', self.path)
+
+def enable(root: str, mode: str):
+    # profiles the bots played from now on, in-process or in processes
+    # started by this one
+    os.environ[PROFILE_ENV] = os.path.abspath(root)
+    os.environ[MODE_ENV] = mode
+
+# the profilers of the in-process bots, by directory
+_profilers = {}
+
+def botLabel(bot) -> str:
+    # a strategy name, or the name of the script a command runs
+    if isinstance(bot, str):
+        return bot
+    scripts = [arg for arg in bot if arg.endswith('.py')]
+    return os.path.splitext(os.path.basename(scripts[0] if scripts else bot[0]))[0]
+
+def forBot(root: str, bot) -> Profiler:
+    directory = os.path.join(root, botLabel(bot))
+    if directory not in _profilers:
+        _profilers[directory] = Profiler(directory)
+    return _profilers[directory]
+
+def saveAll():
+    for profiler in _profilers.values():
+        profiler.save()
+
+def collect(root: str) -> list:
+    # merges the files of each bot directory of `root`, returns the paths
+    # of the merged files
+    merged = []
+    for label in sorted(os.listdir(root)):
+        directory = os.path.join(root, label)
+        if not os.path.isdir(directory):
+            continue
+        names = sorted(os.listdir(directory))
+        stats = [os.path.join(directory, name) for name in names if name.endswith(DeterministicProfiler.suffix)]
+        merger = None
+        for name in stats:
+            try:
+                if merger:
+                    merger.add(name)
+                else:
+                    merger = pstats.Stats(name)
+            except (EOFError, TypeError, ValueError, OSError):
+                # a bot killed while writing its profile
+                print('skipping unreadable profile', name, file=sys.stderr)
+        if merger:
+            path = os.path.join(root, label + DeterministicProfiler.suffix)
+            merger.dump_stats(path)
+            merged.append(path)
+        stacks = [os.path.join(directory, name) for name in names if name.endswith(SamplingProfiler.suffix)]
+        if stacks:
+            counts = Counter()
+            for name in stacks:
+                with open(name) as f:
+                    for line in f:
+                        stack, count = line.rsplit(' ', 1)
+                        counts[stack] += int(count)
+            path = os.path.join(root, label + SamplingProfiler.suffix)
+            with open(path, 'w') as f:
+                for stack, count in counts.most_common():
+                    f.write('{} {}\n'.format(stack, count))
+            merged.append(path)
+    return merged
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Merge the profiles of the bots of a run and show the hot spots.')
+    parser.add_argument('directory', help='the directory of $TANK_PROFILE')
+    parser.add_argument('-n', '--lines', type=int, default=20, help='functions to show per profile')
+    parser.add_argument('--sort', default='tottime', help='pstats sort key')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    for path in collect(args.directory):
+        print('====', path)
+        if path.endswith(DeterministicProfiler.suffix):
+            pstats.Stats(path).sort_stats(args.sort).print_stats(args.lines)
+        else:
+            # the functions the samples were taken in
+            leaves = Counter()
+            with open(path) as f:
+                for line in f:
+                    stack, count = line.rsplit(' ', 1)
+                    leaves[stack.rsplit(';', 1)[-1]] += int(count)
+            total = sum(leaves.values())
+            for function, count in leaves.most_common(args.lines):
+                print('{:6.1%} {:8d}  {}'.format(count / total, count, function))
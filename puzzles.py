@@ -0,0 +1,167 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import mapgen
+from engine import SIDE_COUNT, TANK_PER_SIDE, Action, FieldItemType, TankField, State, WhoWins
+from safety import SafetySearch
+from strategies import STRATEGIES, load_strategy
+
+# Positions with the actions a strategy must or must not choose, checked
+# in seconds instead of playing games. A puzzle file is a JSON list of
+#   {"name": ..., "grid": the matrix of TankField.fromMatrix, "side": 0,
+#    "lastActions": [[blue tanks], [red tanks]], "turn": 1,
+#    "expect": [actions of tank 0 or null, actions of tank 1 or null],
+#    "forbid": [the same]}
+# where only name, grid and side are required, actions are numbers or
+# names of Action, and the tanks missing from the grid are destroyed.
+# `generate` writes dodge puzzles from random games: the actions that let
+# an enemy tank shoot ours next turn, by safety.py, are forbidden. The
+# suite puzzles-dodge-seed0.json is `generate -n 300 --seed 0`.
+
+def action(value) -> int:
+    return getattr(Action, value) if isinstance(value, str) else value
+
+def load_puzzles(path: str) -> list:
+    with open(path) as f:
+        return json.load(f)
+
+def setup(puzzle) -> TankField:
+    field = TankField()
+    field.fromMatrix(puzzle['grid'])
+    if 'lastActions' in puzzle:
+        field.lastActions = [[action(a) for a in actions] for actions in puzzle['lastActions']]
+    field.currentTurn = puzzle.get('turn', 1)
+    return field
+
+def check(puzzle, actions) -> list:
+    # what is wrong with `actions`, nothing if the puzzle is solved
+    errors = []
+    for tank in range(TANK_PER_SIDE):
+        expected = (puzzle.get('expect') or [None] * TANK_PER_SIDE)[tank]
+        forbidden = (puzzle.get('forbid') or [None] * TANK_PER_SIDE)[tank]
+        if expected is not None and actions[tank] not in [action(a) for a in expected]:
+            errors.append('tank {}: {} not in {}'.format(tank, actions[tank], expected))
+        if forbidden is not None and actions[tank] in [action(a) for a in forbidden]:
+            errors.append('tank {}: {} in {}'.format(tank, actions[tank], forbidden))
+    return errors
+
+def warmup(strategy: str, seed: int):
+    # loads the strategy in a worker of the pool and lets it build what it
+    # builds on its first decisions, the tables of the board and the
+    # modules loaded lazily, out of the time of the first puzzle: on a
+    # generated map, then with one tank left on each side
+    decide = load_strategy(strategy)
+    field = TankField()
+    field.fromBinary(mapgen.generate(random.Random(seed)))
+    grid = toMatrix(field)
+    endgame = [[0 if cell in (-2, -4) else cell for cell in row] for row in grid]
+    for puzzle in ({'grid': grid, 'side': 0}, {'grid': endgame, 'side': 1}):
+        decide(setup(puzzle), puzzle['side'], State(random.Random(seed)))
+
+def solve(strategy: str, puzzle, seed: int) -> dict:
+    # the decision of `strategy` on a puzzle, its errors and the seconds it
+    # took, in a worker of the pool where the strategy is loaded and warmed
+    # up once
+    decide = load_strategy(strategy)
+    field = setup(puzzle)
+    start = time.perf_counter()
+    try:
+        actions = decide(field, puzzle['side'], State(random.Random(seed)))
+        errors = check(puzzle, actions)
+    except Exception as e:
+        actions, errors = None, ['{}: {}'.format(type(e).__name__, e)]
+    return {'name': puzzle['name'], 'actions': actions, 'errors': errors, 'seconds': time.perf_counter() - start}
+
+def run(strategy: str, puzzles, jobs: int, seed: int = 0) -> list:
+    with ProcessPoolExecutor(jobs, initializer=warmup, initargs=(strategy, seed)) as executor:
+        return list(executor.map(solve, [strategy] * len(puzzles), puzzles, range(seed, seed + len(puzzles)),
+                                 chunksize=max(1, len(puzzles) // (4 * jobs))))
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def report(results, slowest: int):
+    failed = [result for result in results if result['errors']]
+    print('{}/{} solved ({:.1%})'.format(len(results) - len(failed), len(results), 1 - len(failed) / len(results)))
+    for result in failed:
+        print('FAIL {}: {}'.format(result['name'], '; '.join(result['errors'])))
+    times = [result['seconds'] * 1e3 for result in results]
+    print('latency: mean {:.2f} ms, p50 {:.2f} ms, p99 {:.2f} ms, max {:.2f} ms'.format(
+        sum(times) / len(times), percentile(times, 0.5), percentile(times, 0.99), max(times)))
+    for result in sorted(results, key=lambda result: -result['seconds'])[:slowest]:
+        print('{:8.2f} ms  {}'.format(result['seconds'] * 1e3, result['name']))
+
+def toMatrix(field: TankField) -> list:
+    # the matrix of fromMatrix, tanks as -1 to -4
+    grid = [[0] * len(row) for row in field.fieldContent]
+    for y, row in enumerate(field.fieldContent):
+        for x, cell in enumerate(row):
+            if cell:
+                item = cell[0]
+                grid[y][x] = -(item.side * TANK_PER_SIDE + item.tankID + 1) if item.itemType == FieldItemType.Tank else item.itemType
+    return grid
+
+def generate(count: int, seed: int, maxTurns: int = 40) -> list:
+    # dodge puzzles from positions of random games, for a tank that has both
+    # safe and unsafe actions, without two tanks in a cell
+    decide = load_strategy('random')
+    rng = random.Random(seed)
+    puzzles = []
+    while len(puzzles) < count:
+        field = TankField()
+        field.fromBinary(mapgen.generate(rng))
+        state = State(rng)
+        for turn in range(rng.randrange(1, maxTurns)):
+            actions = [decide(field, side, state) for side in range(SIDE_COUNT)]
+            for side in range(SIDE_COUNT):
+                field.setActions(side, actions[side])
+            field.doActions()
+            if field.whoWins() != WhoWins.NotFinished:
+                break
+        else:
+            side = rng.randrange(SIDE_COUNT)
+            if any(len(cell) > 1 for row in field.fieldContent for cell in row):
+                continue
+            search = SafetySearch(field, side)
+            forbid = []
+            for tank in range(TANK_PER_SIDE):
+                valid = [a for a in range(Action.Stay, Action.LeftShoot + 1) if field.actionValid(side, tank, a)]
+                safe = search.safeActions(tank, 1)
+                forbid.append(sorted(set(valid) - set(safe)) if safe and len(safe) < len(valid) else None)
+            if any(forbid):
+                puzzles.append({'name': 'dodge {}'.format(len(puzzles)), 'grid': toMatrix(field), 'side': side,
+                                'lastActions': field.lastActions, 'turn': field.currentTurn, 'forbid': forbid})
+    return puzzles
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Check the decisions of a strategy on puzzle positions.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    runner = subparsers.add_parser('run', help='run a strategy on puzzle files')
+    runner.add_argument('files', nargs='+', help='JSON puzzle files')
+    runner.add_argument('-s', '--strategy', default='ht', help='one of {}'.format(', '.join(sorted(STRATEGIES))))
+    runner.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='puzzles solved in parallel')
+    runner.add_argument('--seed', type=int, default=0, help='seed of the random numbers of the first puzzle')
+    runner.add_argument('--slowest', type=int, default=5, help='slowest puzzles to show')
+    generator = subparsers.add_parser('generate', help='write dodge puzzles from random games')
+    generator.add_argument('-n', '--count', type=int, default=200, help='number of puzzles')
+    generator.add_argument('--seed', type=int, default=0, help='seed of the games')
+    generator.add_argument('-o', '--output', required=True, help='the JSON file to write')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.command == 'run':
+        puzzles = [puzzle for path in args.files for puzzle in load_puzzles(path)]
+        report(run(args.strategy, puzzles, args.jobs, args.seed), args.slowest)
+    else:
+        # one puzzle a line
+        with open(args.output, 'w') as f:
+            f.write('[\n' + ',\n'.join(json.dumps(puzzle) for puzzle in generate(args.count, args.seed)) + '\n]\n')
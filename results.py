@@ -0,0 +1,124 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import sqlite3
+import time
+from collections import defaultdict
+
+from engine import WhoWins, SIDE_COUNT
+
+# The results of the games of tournaments, in an SQLite database in WAL
+# mode, so that a run killed at any point loses at most the games not yet
+# flushed. Games are added to a buffer written in one transaction every
+# BATCH_SIZE games or FLUSH_INTERVAL seconds. A game is identified by an
+# id the tournament derives from what it plays (bots, index), a run
+# started again with the same arguments skips the games already stored.
+
+BATCH_SIZE = 32
+# seconds
+FLUSH_INTERVAL = 10.0
+
+SCHEMA = '''
+create table if not exists games (
+    id text primary key,
+    map text not null,      -- JSON of the three 27-bit brick fields
+    bots text not null,     -- JSON of the blue and red bots, names or commands
+    seed integer,
+    winner integer not null,
+    turns integer not null,
+    failures text not null, -- JSON per side: null, timeout, crash or invalid
+    elapsed text not null,  -- JSON per side: seconds of the slowest and of all turns
+    duration real not null, -- seconds of the game
+    finished real not null  -- time.time() when the game ended
+)
+'''
+
+COLUMNS = ['id', 'map', 'bots', 'seed', 'winner', 'turns', 'failures', 'elapsed', 'duration', 'finished']
+
+class ResultStore:
+
+    def __init__(self, path: str, batchSize: int = BATCH_SIZE, interval: float = FLUSH_INTERVAL):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('pragma journal_mode=wal')
+        # a transaction is durable at the next checkpoint, enough for games
+        # that can be played again
+        self.connection.execute('pragma synchronous=normal')
+        self.connection.execute(SCHEMA)
+        self.connection.commit()
+        self.batchSize = batchSize
+        self.interval = interval
+        self.buffer = []
+        self.flushed = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, gameId: str, bots, init_data, seed, result: dict):
+        # `result`: of drive.run_match(), with the 'duration' of the game
+        elapsed = [[max(times, default=0.0), sum(times)] for times in result['elapsed']]
+        self.buffer.append((gameId, json.dumps(init_data), json.dumps(bots), seed, result['winner'], result['turns'],
+                            json.dumps(result['failures']), json.dumps(elapsed), result['duration'], time.time()))
+        if len(self.buffer) >= self.batchSize or time.monotonic() - self.flushed >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            with self.connection:
+                self.connection.executemany('insert or ignore into games values ({})'.format(', '.join('?' * len(COLUMNS))),
+                                            self.buffer)
+            self.buffer = []
+        self.flushed = time.monotonic()
+
+    def games(self, prefix: str = '') -> dict:
+        # the stored games whose id starts with `prefix`, by id, the buffered
+        # ones included
+        self.flush()
+        rows = self.connection.execute('select * from games where substr(id, 1, ?) = ?', (len(prefix), prefix))
+        games = {}
+        for row in rows:
+            game = dict(zip(COLUMNS, row))
+            for column in ['map', 'bots', 'failures', 'elapsed']:
+                game[column] = json.loads(game[column])
+            games[game['id']] = game
+        return games
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+def botName(bot) -> str:
+    # the --new/--old text of a bot
+    return bot if isinstance(bot, str) else ' '.join(bot)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Summarize the games of a result store.')
+    parser.add_argument('path', help='the SQLite database of the games')
+    parser.add_argument('--prefix', default='', help='only the games whose id starts with this')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    with ResultStore(args.path) as store:
+        games = store.games(args.prefix)
+    # wins, draws, losses of the first bot of each pair of bots, either colour
+    scores = defaultdict(lambda: [0, 0, 0])
+    turns = defaultdict(int)
+    duration = 0.0
+    for game in games.values():
+        bots = [botName(bot) for bot in game['bots']]
+        pair = tuple(sorted(bots))
+        if game['winner'] == WhoWins.Draw:
+            scores[pair][1] += 1
+        elif game['winner'] in range(SIDE_COUNT):
+            scores[pair][0 if bots[game['winner']] == pair[0] else 2] += 1
+        turns[pair] += game['turns']
+        duration += game['duration']
+    print('{} games, {:.1f} hours of play'.format(len(games), duration / 3600))
+    for pair, (wins, draws, losses) in sorted(scores.items()):
+        print('{} vs {}: +{} ={} -{}, {:.1f} turns per game'.format(
+            pair[0], pair[1], wins, draws, losses, turns[pair] / (wins + draws + losses)))
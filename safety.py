@@ -0,0 +1,211 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from itertools import product
+
+from engine import FIELD_HEIGHT, FIELD_WIDTH, Action, FieldItemType
+
+# Which actions of a tank keep it alive for the next k turns whatever the
+# enemy tanks do. An action is safe for k turns if no joint action of the
+# enemies destroys the tank this turn and, for every one of them, some
+# action of the next position is safe for k - 1 turns. The rules are
+# those of doActions with one of our tanks moving:
+#  - our other tank stays where it is and doesn't shoot, it only blocks
+#    until a shot destroys it;
+#  - an enemy tank stays, moves, or shoots at our tank if it is on its
+#    row or column, or at the first brick of a line if a turn follows:
+#    the brick broken may open a line for the other enemy tank, or for
+#    itself after its cooldown. Its other shots are left out, they
+#    can't hit us and leave it on cooldown;
+#  - bricks broken by the shots searched are removed, a base or steel
+#    stops a shot. A shot of ours at our base loses the game, it counts
+#    as our tank destroyed.
+# The lines of sight come from the rays of TankField.board, as cell
+# indices y * FIELD_WIDTH + x.
+
+CELLS = FIELD_WIDTH * FIELD_HEIGHT
+SHOOT = Action.UpShoot
+
+class Lines:
+    # the tables of Board by cell index: neighbors[cell][d] (-1 off the
+    # field), rays[cell][d], and aim[source * CELLS + target], the shot
+    # from source that goes through target, or Action.Invalid
+    def __init__(self, board):
+        def index(cell):
+            return cell[1] * FIELD_WIDTH + cell[0] if cell else -1
+        cells = [(c % FIELD_WIDTH, c // FIELD_WIDTH) for c in range(CELLS)]
+        self.neighbors = [[index(board.neighbors[y][x][d]) for d in range(4)] for x, y in cells]
+        self.rays = [[tuple(index(cell) for cell in board.rays[y][x][d]) for d in range(4)] for x, y in cells]
+        self.aim = [Action.Invalid] * (CELLS * CELLS)
+        for c in range(CELLS):
+            for d in range(4):
+                for target in self.rays[c][d]:
+                    self.aim[c * CELLS + target] = SHOOT + d
+
+_lines = None
+
+def lines(field) -> Lines:
+    global _lines
+    if _lines is None:
+        _lines = Lines(field.board)
+    return _lines
+
+class SafetySearch:
+
+    def __init__(self, field, side: int):
+        self.field = field
+        self.side = side
+        self.lines = lines(field)
+        # the cells a shot stops at and a tank can't enter besides tanks:
+        # 1 for a brick, 2 for steel or a base
+        self.walls = bytearray(CELLS)
+        for y in range(FIELD_HEIGHT):
+            for x in range(FIELD_WIDTH):
+                cell = field.fieldContent[y][x]
+                if cell and cell[0].itemType != FieldItemType.Tank:
+                    self.walls[y * FIELD_WIDTH + x] = 1 if cell[0].itemType == FieldItemType.Brick else 2
+        base = field.bases[side]
+        self.base = -1 if base.destroyed else base.y * FIELD_WIDTH + base.x
+        self.memo = {}
+
+    def safeActions(self, tank: int, depth: int) -> list:
+        # the valid actions of our tank `tank` that are safe for `depth`
+        # turns, all of them if it is destroyed or no enemy can reach it
+        actions = [action for action in range(Action.Stay, Action.LeftShoot + 1)
+                   if self.field.actionValid(self.side, tank, action)]
+        return [action for action in actions if self.isSafe(tank, action, depth)]
+
+    def isSafe(self, tank: int, action: int, depth: int) -> bool:
+        field, side = self.field, self.side
+        me = field.tanks[side][tank]
+        if me.destroyed:
+            return True
+        cell = me.y * FIELD_WIDTH + me.x
+        enemies = self._threats(depth, cell, tuple((t.y * FIELD_WIDTH + t.x, field.lastActions[1 - side][t.tankID] >= SHOOT)
+                                                   for t in field.tanks[1 - side] if not t.destroyed))
+        if not enemies:
+            return True
+        mate = field.tanks[side][1 - tank]
+        mate = -1 if mate.destroyed else mate.y * FIELD_WIDTH + mate.x
+        return self._holds(depth, cell, mate, enemies, frozenset(), action)
+
+    def _free(self, cell: int, broken) -> bool:
+        return cell >= 0 and (not self.walls[cell] or cell in broken)
+
+    def _myActions(self, me: int, mate: int, cooldown: bool, enemies, broken) -> list:
+        # a shot of ours only matters if it may hit an enemy tank this turn
+        lines = self.lines
+        actions = [Action.Stay]
+        occupied = [cell for cell, _ in enemies]
+        for d in range(4):
+            target = lines.neighbors[me][d]
+            if self._free(target, broken) and target != mate and target not in occupied:
+                actions.append(d)
+        if not cooldown:
+            shots = set()
+            for cell in occupied:
+                shots.add(lines.aim[me * CELLS + cell])
+                shots.update(lines.aim[me * CELLS + target] for target in lines.neighbors[cell] if target >= 0)
+            actions.extend(sorted(shots - {Action.Invalid}))
+        return actions
+
+    def _threats(self, depth: int, me: int, enemies):
+        # the enemies that may get on the row or column of our tank within
+        # `depth` turns: after t turns of ours and t - 1 moves of theirs
+        threats = []
+        x, y = me % FIELD_WIDTH, me // FIELD_WIDTH
+        for cell, cooldown in enemies:
+            if min(abs(cell % FIELD_WIDTH - x), abs(cell // FIELD_WIDTH - y)) < 2 * depth:
+                threats.append((cell, cooldown))
+        return tuple(threats)
+
+    def _enemyActions(self, depth: int, i: int, me: int, mate: int, moved: int, enemies, broken) -> list:
+        # (action, cell after the move) of what enemy `i` may do while our
+        # tank goes from `me` to `moved`, with `depth` turns to search
+        cell, cooldown = enemies[i]
+        actions = [(Action.Stay, cell)]
+        for d in range(4):
+            target = self.lines.neighbors[cell][d]
+            if self._free(target, broken) and target != mate and target != me and \
+                    all(target != other for j, (other, _) in enumerate(enemies) if j != i):
+                actions.append((d, target))
+        if not cooldown:
+            aim = self.lines.aim[cell * CELLS + moved]
+            if aim != Action.Invalid:
+                actions.append((aim, cell))
+            # a lone enemy is on cooldown the turn after, a line it opens
+            # only matters with a third turn
+            if depth > 2 or depth > 1 and len(enemies) > 1:
+                for d in range(4):
+                    wall = next((c for c in self.lines.rays[cell][d] if self.walls[c] and c not in broken), -1)
+                    if wall >= 0 and self.walls[wall] == 1 and SHOOT + d != aim:
+                        actions.append((SHOOT + d, cell))
+        return actions
+
+    def _holds(self, depth: int, me: int, mate: int, enemies, broken, action: int) -> bool:
+        # if `action` keeps our tank alive for `depth` turns
+        moved = self.lines.neighbors[me][action] if Action.Up <= action < SHOOT else me
+        options = [self._enemyActions(depth, i, me, mate, moved, enemies, broken) for i in range(len(enemies))]
+        for joint in product(*options):
+            if all(enemyAction < SHOOT for enemyAction, _ in joint):
+                # nothing can hit us this turn
+                if depth == 1:
+                    continue
+                if action < SHOOT:
+                    if not self._safe(depth - 1, moved, mate, False, tuple((cell, False) for _, cell in joint), broken):
+                        return False
+                    continue
+            result = self._step(moved, mate, action, joint, broken)
+            if result is None:
+                return False
+            if depth > 1 and not self._safe(depth - 1, moved, result[2], action >= SHOOT, *result[:2]):
+                return False
+        return True
+
+    def _safe(self, depth: int, me: int, mate: int, cooldown: bool, enemies, broken) -> bool:
+        # the enemies too far to shoot us in time are left out, they could
+        # only stand in the way of the others' bullets
+        enemies = self._threats(depth, me, enemies)
+        if not enemies:
+            return True
+        key = (depth, me, mate, cooldown, enemies, broken)
+        if key not in self.memo:
+            self.memo[key] = any(self._holds(depth, me, mate, enemies, broken, action)
+                                 for action in self._myActions(me, mate, cooldown, enemies, broken))
+        return self.memo[key]
+
+    def _step(self, me: int, mate: int, action: int, joint, broken):
+        # the turn after the moves: None if our tank or our base is
+        # destroyed, else the enemies left, the bricks broken and the cell of
+        # our other tank, -1 once destroyed. Tanks are numbered 0 for ours, 1
+        # for our other tank and 2 + i for enemy i.
+        positions = [me, mate]
+        actions = [action, Action.Stay]
+        for enemyAction, cell in joint:
+            positions.append(cell)
+            actions.append(enemyAction)
+        destroyed = set()
+        newlyBroken = []
+        for shooter, shot in enumerate(actions):
+            if shot < SHOOT:
+                continue
+            source = positions[shooter]
+            alone = positions.count(source) == 1
+            d = shot - SHOOT
+            for cell in self.lines.rays[source][d]:
+                if self.walls[cell] and cell not in broken:
+                    if self.walls[cell] == 1:
+                        newlyBroken.append(cell)
+                    elif cell == self.base:
+                        destroyed.add(0)
+                    break
+                if cell in positions:
+                    hit = [tank for tank, position in enumerate(positions) if position == cell]
+                    if alone and len(hit) == 1 and actions[hit[0]] >= SHOOT and d == (actions[hit[0]] - SHOOT + 2) % 4:
+                        break
+                    destroyed.update(hit)
+                    break
+        if 0 in destroyed:
+            return None
+        left = tuple((positions[2 + i], actions[2 + i] >= SHOOT) for i in range(len(joint)) if 2 + i not in destroyed)
+        return left, broken.union(newlyBroken) if newlyBroken else broken, -1 if 1 in destroyed else mate
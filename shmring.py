@@ -0,0 +1,217 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import mmap
+import multiprocessing.util
+import os
+import select
+import struct
+import subprocess
+import tempfile
+import time
+
+from engine import NO_SPAN, SHM_ENV, TRANSPORT_ENV, State, TankField, span
+
+# A transport between the driver and its bots for self-play runs, in
+# place of the JSON lines of Botzone: the requests and responses are
+# records of eight int32 in two rings of a memory block shared
+# with the bot, and the pipes of the bot only carry one byte per record
+# to wake the other side. The bot is a worker started once and kept for
+# the following games, a game starts with a NEW_GAME record, so neither
+# the start of Python nor the import of the bot is paid again.
+#
+# The block is a memfd (a temporary file where there is none) passed to
+# the bot as file descriptor $TANK_SHM, it goes away with the last
+# process that maps it. A ring has a head written by its producer only,
+# a tail written by its consumer only, and SLOTS records; a record is
+# written before the head that publishes it. Workers are pooled by
+# command and environment, see take() and give(), an idle worker exits
+# with the driver when its stdin is closed.
+#
+# Only the actions go through: a worker has no debug output (use
+# $TANK_DEBUG) and keeps its globaldata across the games it plays.
+
+NEW_GAME = 1
+ACTIONS = 2
+RESPONSE = 3
+
+# kind, seq, side, bricks[3], actions[2]: the seq of a response is the one
+# of its request, its bricks[0:2] the microseconds of time.monotonic(), the
+# same clock in every process, when it was written, split in 31-bit halves
+RECORD = struct.Struct('<8i')
+RING = struct.Struct('<II')
+SLOTS = 8
+RING_SIZE = RING.size + SLOTS * RECORD.size
+SIZE = 2 * RING_SIZE
+
+DOORBELL = b'.'
+
+class Ring:
+    # one producer, one consumer
+    def __init__(self, memory, offset: int):
+        self.memory = memory
+        self.offset = offset
+
+    def put(self, record) -> bool:
+        head, tail = RING.unpack_from(self.memory, self.offset)
+        if (head - tail) & 0xffffffff >= SLOTS:
+            return False
+        RECORD.pack_into(self.memory, self.offset + RING.size + head % SLOTS * RECORD.size, *record)
+        struct.pack_into('<I', self.memory, self.offset, (head + 1) & 0xffffffff)
+        return True
+
+    def get(self):
+        head, tail = RING.unpack_from(self.memory, self.offset)
+        if head == tail:
+            return None
+        record = RECORD.unpack_from(self.memory, self.offset + RING.size + tail % SLOTS * RECORD.size)
+        struct.pack_into('<I', self.memory, self.offset + 4, (tail + 1) & 0xffffffff)
+        return record
+
+class Channel:
+    # the requests and responses rings of a block
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.memory = mmap.mmap(fd, SIZE)
+        self.requests = Ring(self.memory, 0)
+        self.responses = Ring(self.memory, RING_SIZE)
+
+    @classmethod
+    def create(cls) -> 'Channel':
+        if hasattr(os, 'memfd_create'):
+            fd = os.memfd_create('tank-shm')
+        else:
+            fd = os.dup(tempfile.TemporaryFile().fileno())
+        os.ftruncate(fd, SIZE)
+        return cls(fd)
+
+    def close(self):
+        self.memory.close()
+        os.close(self.fd)
+
+class Worker:
+    # a bot process of the driver with its channel
+    def __init__(self, command, env):
+        self.channel = Channel.create()
+        env = dict(env, **{SHM_ENV: str(self.channel.fd)})
+        self.proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env,
+                                     pass_fds=(self.channel.fd,), bufsize=0)
+        self.seq = 0
+
+    def send(self, kind: int, side: int, bricks=(0, 0, 0), actions=(0, 0)):
+        self.seq += 1
+        if not self.channel.requests.put((kind, self.seq, side, *bricks, *actions)):
+            raise RuntimeError('the requests ring of the worker is full')
+        try:
+            self.proc.stdin.write(DOORBELL)
+        except OSError:
+            pass # the bot is gone, the following receive reports it
+
+    def receive(self, deadline: float):
+        # (actions, time.monotonic() they were written at) of the response to
+        # the last request, actions None if the bot exits or doesn't answer
+        # before `deadline`
+        fd = self.proc.stdout.fileno()
+        while True:
+            record = self.channel.responses.get()
+            while record is not None and record[1] != self.seq:
+                record = self.channel.responses.get()
+            if record is not None:
+                written = (record[3] << 31 | record[4]) / 1e6
+                return (list(record[6:8]) if written <= deadline else None), written
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                return None, time.monotonic()
+            if not os.read(fd, 4096):
+                # the bot exited, let failure() see it
+                try:
+                    self.proc.wait(timeout=1.0)
+                except subprocess.TimeoutExpired:
+                    pass
+                return None, time.monotonic()
+
+    def close(self, kill: bool = False):
+        # closing stdin ends a worker waiting for a request, one that failed
+        # is killed
+        if self.proc.poll() is None:
+            if kill:
+                self.proc.kill()
+            else:
+                self.proc.stdin.close()
+            try:
+                self.proc.wait(timeout=1.0)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        self.proc.stdin.close()
+        self.proc.stdout.close()
+        self.channel.close()
+
+# the idle workers of this process, by command and environment
+_idle = {}
+
+def _key(command, env) -> tuple:
+    return tuple(command), tuple(sorted(env.items()))
+
+def take(command, env) -> Worker:
+    workers = _idle.get(_key(command, env))
+    return workers.pop() if workers else Worker(command, env)
+
+def give(worker: Worker, command, env):
+    # a worker that answered all its requests, for the next game
+    _idle.setdefault(_key(command, env), []).append(worker)
+
+def closeAll():
+    # ends the idle workers, which save their profiles
+    for workers in _idle.values():
+        for worker in workers:
+            worker.close()
+    _idle.clear()
+
+def closeAtExit():
+    # closeAll() when this process exits, also a process of a pool, which
+    # doesn't run atexit: the initializer of the pools of games
+    multiprocessing.util.Finalize(None, closeAll, exitpriority=0)
+
+def enable():
+    # the bots in a process started from now on, by this process or its
+    # children, use this transport
+    os.environ[TRANSPORT_ENV] = 'shm'
+
+def serve(decide, state: State, profiler=None, debugLog=None):
+    # the loop of engine.play() on the bot side: the games of the requests
+    # of $TANK_SHM until the driver closes stdin
+    channel = Channel(int(os.environ[SHM_ENV]))
+    field = None
+    mySide = -1
+    while True:
+        if not os.read(0, 4096):
+            # the driver closed stdin
+            if profiler:
+                profiler.save()
+            return
+        while True:
+            request = channel.requests.get()
+            if request is None:
+                break
+            kind, seq, side = request[:3]
+            with span('readInput'):
+                if kind == NEW_GAME:
+                    field = TankField()
+                    field.fromBinary(list(request[3:6]))
+                    mySide = side
+                    globaldata = state.globaldata
+                    state = State(state.rng)
+                    state.globaldata = globaldata
+                else:
+                    field.setActions(1 - mySide, list(request[6:8]))
+                    field.doActions()
+            state.debug = []
+            with span('decide', turn=field.currentTurn), profiler or NO_SPAN:
+                myActions = decide(field, mySide, state)
+            written = int(time.monotonic() * 1e6)
+            channel.responses.put((RESPONSE, seq, mySide, written >> 31, written & 0x7fffffff, 0, *myActions))
+            os.write(1, DOORBELL)
+            if debugLog:
+                debugLog.write(field.currentTurn, mySide, state.debug)
+            field.setActions(mySide, myActions)
@@ -0,0 +1,57 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import shlex
+import subprocess
+import sys
+import time
+
+from drive import FIRST_TURN_TIMEOUT, start_proc, write_to_proc, read_from_proc, kill_proc, to_binary, init_grid
+
+# The cost of the first turn of a bot: starting the interpreter, importing
+# the modules and answering the first request, measured from outside as
+# the driver sees it, and the import times of python -X importtime.
+
+def first_response(command, request) -> float:
+    proc = start_proc(command)
+    try:
+        start = time.monotonic()
+        write_to_proc(proc, json.dumps(request) + '\n')
+        if read_from_proc(proc, FIRST_TURN_TIMEOUT) is None:
+            raise RuntimeError('{} did not answer the first request'.format(' '.join(command)))
+        return time.monotonic() - start
+    finally:
+        kill_proc(proc)
+
+def import_times(command, request) -> list:
+    # (cumulative microseconds, module) of the top-level imports
+    proc = subprocess.run([command[0], '-X', 'importtime'] + command[1:], input=(json.dumps(request) + '\n').encode(),
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=FIRST_TURN_TIMEOUT * 5)
+    times = []
+    for line in proc.stderr.decode().splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):
+            times.append((int(cumulative), name.strip()))
+    return sorted(times, reverse=True)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Measure the startup time of a Botzone bot.')
+    parser.add_argument('command', nargs='?', default='{} main-ht.py'.format(sys.executable), help='command of the bot')
+    parser.add_argument('-n', '--runs', type=int, default=10, help='number of starts to measure')
+    parser.add_argument('--imports', type=int, default=10, help='top-level imports to show')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    command = shlex.split(args.command)
+    request = {'field': to_binary(init_grid), 'mySide': 0}
+    baseline = [first_response([command[0], '-c', 'print(input())'], request) for run in range(args.runs)]
+    times = [first_response(command, request) for run in range(args.runs)]
+    print('interpreter: min {:.1f} ms, mean {:.1f} ms'.format(min(baseline) * 1e3, sum(baseline) / len(baseline) * 1e3))
+    print('first response: min {:.1f} ms, mean {:.1f} ms'.format(min(times) * 1e3, sum(times) / len(times) * 1e3))
+    for cumulative, name in import_times(command, request)[:args.imports]:
+        print('{:8.1f} ms  {}'.format(cumulative / 1e3, name))
@@ -0,0 +1,50 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import importlib.util
+import os
+import sys
+
+from engine import play
+
+# The registered bots: a name for the module defining the strategy
+# decide(field, side, state) -> actions. Modules are loaded from their
+# file, main-ht.py can't be imported by name.
+STRATEGIES = {
+    'random': 'main.py',
+    'ht': 'main-ht.py',
+}
+
+_modules = {}
+
+def load_module(path: str):
+    # each file is executed once per process, its globals (PARAMS, the
+    # endgame tables) are shared by all the games played in-process
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    if path not in _modules:
+        name = os.path.splitext(os.path.basename(path))[0].replace('-', '_')
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[path] = module
+    return _modules[path]
+
+def load_strategy(name: str):
+    # a registered name, or the path of a module defining decide()
+    if name not in STRATEGIES and not name.endswith('.py'):
+        raise KeyError('unknown strategy {}, one of {}'.format(name, ', '.join(sorted(STRATEGIES))))
+    return load_module(STRATEGIES.get(name, name)).decide
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run a registered strategy as a Botzone bot.')
+    parser.add_argument('strategy', help='one of {}, or a module defining decide()'.format(', '.join(sorted(STRATEGIES))))
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    try:
+        decide = load_strategy(args.strategy)
+    except KeyError as e:
+        sys.exit(e.args[0])
+    play(decide)
@@ -0,0 +1,95 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from engine import FIELD_HEIGHT, FIELD_WIDTH, SIDE_COUNT, TANK_PER_SIDE, Action, FieldItemType
+from mapgen import rotate
+
+# The rules are invariant under a 180 degree rotation of the field that
+# swaps the two sides: blue tank t at (x, y) becomes red tank t at
+# (8 - x, 8 - y), and every direction is reversed. Mapping each position
+# to the frame where the side to move is blue lets caches store one entry
+# for both sides.
+
+def mirrorAction(action: int) -> int:
+    if action < Action.Up:
+        return action
+    return action // 4 * 4 + (action + 2) % 4
+
+def mirrorActions(actions):
+    return [mirrorAction(action) for action in actions]
+
+def brickBits(field) -> int:
+    value = 0
+    for y in range(FIELD_HEIGHT):
+        for x in range(FIELD_WIDTH):
+            cell = field.fieldContent[y][x]
+            if cell and cell[0].itemType == FieldItemType.Brick:
+                value |= 1 << (y * FIELD_WIDTH + x)
+    return value
+
+def rotateField(field):
+    rotated = field.__class__()
+    rotated.fieldContent = [[[] for x in range(FIELD_WIDTH)] for y in range(FIELD_HEIGHT)]
+    for row in field.fieldContent:
+        for cell in row:
+            for item in cell:
+                if item.itemType == FieldItemType.Brick or item.itemType == FieldItemType.Steel:
+                    rotated.insertFieldItem(item.__class__(FIELD_WIDTH - 1 - item.x, FIELD_HEIGHT - 1 - item.y, item.itemType))
+    for side in range(SIDE_COUNT):
+        base = field.bases[1 - side]
+        if not base.destroyed:
+            rotated.insertFieldItem(rotated.bases[side])
+        rotated.bases[side].destroyed = base.destroyed
+        for tank in range(TANK_PER_SIDE):
+            source, target = field.tanks[1 - side][tank], rotated.tanks[side][tank]
+            target.x, target.y = FIELD_WIDTH - 1 - source.x, FIELD_HEIGHT - 1 - source.y
+            if not source.destroyed:
+                rotated.insertFieldItem(target)
+            target.destroyed = source.destroyed
+        rotated.lastActions[side] = mirrorActions(field.lastActions[1 - side])
+        rotated.actions[side] = mirrorActions(field.actions[1 - side])
+    rotated.currentTurn = field.currentTurn
+    return rotated
+
+def canonicalize(field, side: int):
+    # the field as seen by `side` playing blue, the field itself for blue,
+    # so the result must not be modified
+    return field if side == 0 else rotateField(field)
+
+def canonicalKey(field, side: int) -> tuple:
+    # identifies the class of `field` with the side to move as blue,
+    # without building the rotated field
+    sides = [side, 1 - side]
+    bricks = brickBits(field)
+    if side == 0:
+        def position(tank): return (tank.x, tank.y)
+        def actions(s): return tuple(field.lastActions[s])
+    else:
+        def position(tank): return (FIELD_WIDTH - 1 - tank.x, FIELD_HEIGHT - 1 - tank.y)
+        def actions(s): return tuple(mirrorActions(field.lastActions[s]))
+        bricks = rotate(bricks)
+    tanks = tuple(None if tank.destroyed else position(tank) for s in sides for tank in field.tanks[s])
+    return (bricks, tanks, tuple(field.bases[s].destroyed for s in sides), tuple(actions(s) for s in sides))
+
+class CanonicalCache:
+    # maps positions to actions of the side to move, one entry for a
+    # position and its rotation. `tag` tells apart the entries of a
+    # position, the tank and depth of a search. Emptied when it reaches
+    # `limit` entries, to bound the memory of a long-running bot.
+    def __init__(self, limit: int = None):
+        self.entries = {}
+        self.limit = limit
+
+    def get(self, field, side: int, tag=None):
+        actions = self.entries.get((canonicalKey(field, side), tag))
+        if actions is None or side == 0:
+            return actions
+        return mirrorActions(actions)
+
+    def put(self, field, side: int, actions, tag=None):
+        if self.limit and len(self.entries) >= self.limit:
+            self.entries.clear()
+        self.entries[(canonicalKey(field, side), tag)] = actions if side == 0 else mirrorActions(actions)
+
+    def __len__(self):
+        return len(self.entries)
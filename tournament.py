@@ -0,0 +1,364 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import math
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import profiling
+import shmring
+from drive import run_match, parse_bot, to_binary, init_grid, FIRST_TURN_TIMEOUT, TURN_TIMEOUT
+from engine import WhoWins, SIDE_COUNT
+from mapgen import load_corpus
+from results import ResultStore, botName
+
+def elo_to_score(elo):
+    return 1.0 / (1.0 + 10.0 ** (-elo / 400.0))
+
+class SPRT:
+    # Sequential probability ratio test of H0: elo == elo0 against
+    # H1: elo == elo1, using the normal approximation of the log-likelihood
+    # ratio of a win/draw/loss outcome.
+    def __init__(self, elo0: float, elo1: float, alpha: float, beta: float):
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+
+    def update(self, score: float):
+        if score == 1:
+            self.wins += 1
+        elif score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    def llr(self) -> float:
+        # half a win and half a loss as prior, so that the variance is never
+        # zero after a run of identical results
+        wins, draws, losses = self.wins + 0.5, self.draws, self.losses + 0.5
+        n = wins + draws + losses
+        mean = (wins + draws / 2) / n
+        var = (wins * (1 - mean) ** 2 + draws * (0.5 - mean) ** 2 + losses * mean ** 2) / n
+        s0, s1 = elo_to_score(self.elo0), elo_to_score(self.elo1)
+        return self.games() * (s1 - s0) * (2 * mean - s0 - s1) / (2 * var)
+
+    def status(self):
+        llr = self.llr()
+        if llr >= self.upper:
+            return 'H1'
+        if llr <= self.lower:
+            return 'H0'
+        return None
+
+# ratings in natural units (log odds) per elo
+ELO = math.log(10) / 400
+
+def solve(matrix, vector):
+    # the x of matrix x = vector, by Gaussian elimination with partial
+    # pivoting, for the few bots of a ladder
+    n = len(vector)
+    rows = [list(row) + [value] for row, value in zip(matrix, vector)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for r in range(col + 1, n):
+            factor = rows[r][col] / rows[col][col]
+            for c in range(col, n + 1):
+                rows[r][c] -= factor * rows[col][c]
+    x = [0.0] * n
+    for r in reversed(range(n)):
+        x[r] = (rows[r][n] - sum(rows[r][c] * x[c] for c in range(r + 1, n))) / rows[r][r]
+    return x
+
+def invert(matrix):
+    n = len(matrix)
+    columns = [solve(matrix, [float(r == c) for r in range(n)]) for c in range(n)]
+    return [[columns[c][r] for c in range(n)] for r in range(n)]
+
+class BradleyTerry:
+    # Bradley-Terry ratings of bots from their games, a draw counting as
+    # half a win: bot i scores against bot j with probability
+    # 1 / (1 + exp(r[j] - r[i])). The ratings are the maximum a posteriori
+    # of a normal prior of `priorElo` around 0, which keeps them finite
+    # after a run of wins and fixes their sum. Their covariance is the
+    # inverse of the Fisher information at the ratings.
+    def __init__(self, n: int, priorElo: float = 400.0):
+        self.n = n
+        self.games = [[0] * n for i in range(n)]
+        self.points = [[0.0] * n for i in range(n)]
+        self.prior = 1 / (priorElo * ELO) ** 2
+        self.ratings = [0.0] * n
+
+    def update(self, i: int, j: int, score: float):
+        # `score` of bot i against bot j
+        self.games[i][j] += 1
+        self.games[j][i] += 1
+        self.points[i][j] += score
+        self.points[j][i] += 1 - score
+
+    def played(self) -> int:
+        return sum(map(sum, self.games)) // 2
+
+    def expected(self, i: int, j: int) -> float:
+        return 1 / (1 + math.exp(self.ratings[j] - self.ratings[i]))
+
+    def information(self, pending=()):
+        # the Fisher information of the games played and of the `pending`
+        # pairings, were they played
+        games = [list(row) for row in self.games]
+        for i, j in pending:
+            games[i][j] += 1
+            games[j][i] += 1
+        info = [[0.0] * self.n for i in range(self.n)]
+        for i in range(self.n):
+            info[i][i] = self.prior
+            for j in range(self.n):
+                if j != i and games[i][j]:
+                    w = games[i][j] * self.expected(i, j) * (1 - self.expected(i, j))
+                    info[i][i] += w
+                    info[i][j] -= w
+        return info
+
+    def fit(self, iterations: int = 20):
+        # Newton's method on the log posterior, which is concave
+        for iteration in range(iterations):
+            gradient = [sum(self.points[i][j] - self.games[i][j] * self.expected(i, j) for j in range(self.n) if j != i)
+                        - self.prior * self.ratings[i] for i in range(self.n)]
+            step = solve(self.information(), gradient)
+            self.ratings = [r + d for r, d in zip(self.ratings, step)]
+            if max(abs(d) for d in step) < 1e-9:
+                break
+
+    def covariance(self, pending=()):
+        return invert(self.information(pending))
+
+    def gain(self, covariance, i: int, j: int) -> float:
+        # how much one more game between i and j lowers the sum of the
+        # variances of the ratings: the game adds w v v^T to the information,
+        # v = e_i - e_j, and by Sherman-Morrison the trace of the covariance
+        # loses w |C v|^2 / (1 + w v^T C v)
+        w = self.expected(i, j) * (1 - self.expected(i, j))
+        cv = [covariance[k][i] - covariance[k][j] for k in range(self.n)]
+        return w * sum(c * c for c in cv) / (1 + w * (cv[i] - cv[j]))
+
+    def nextPairing(self, pending=()):
+        # the pairing that tells the most about the ratings, given the
+        # games played and those being played
+        covariance = self.covariance(pending)
+        pairs = [(i, j) for i in range(self.n) for j in range(i + 1, self.n)]
+        return max(pairs, key=lambda pair: self.gain(covariance, *pair))
+
+    def ranking(self):
+        # (bot, elo, standard deviation in elo) from the strongest, and the
+        # smallest z-score of the difference of two neighbours. Games only
+        # tell the differences of the ratings: the deviation is that of the
+        # difference to the mean rating, which is 0.
+        covariance = self.covariance()
+        n = self.n
+        total = sum(map(sum, covariance)) / n ** 2
+        deviation = [math.sqrt(max(0.0, covariance[i][i] - 2 * sum(covariance[i]) / n + total)) for i in range(n)]
+        order = sorted(range(n), key=lambda i: -self.ratings[i])
+        table = [(i, self.ratings[i] / ELO, deviation[i] / ELO) for i in order]
+        z = min((self.ratings[a] - self.ratings[b]) /
+                math.sqrt(covariance[a][a] + covariance[b][b] - 2 * covariance[a][b]) for a, b in zip(order, order[1:]))
+        return table, z
+
+def pairing_bots(new, old, index):
+    # alternate colours so that the side advantage cancels out
+    return [new, old] if index % SIDE_COUNT == 0 else [old, new]
+
+def pairing_score(winner, index) -> float:
+    # the score of the new bot
+    if winner == index % SIDE_COUNT:
+        return 1.0
+    if winner == WhoWins.Draw:
+        return 0.5
+    return 0.0
+
+def play_pairing(new, old, index, init_data, first_turn_timeout, turn_timeout):
+    start = time.monotonic()
+    result = run_match(pairing_bots(new, old, index), init_data, first_turn_timeout, turn_timeout, seed=index)
+    result['duration'] = time.monotonic() - start
+    return result
+
+def game_id(kind, new, old, index) -> str:
+    return '{}:{} vs {}:{}'.format(kind, botName(new), botName(old), index)
+
+def pick_map(maps, index):
+    # both games of a colour-swapped pair are played on the same map
+    return maps[(index // SIDE_COUNT) % len(maps)]
+
+def load_maps(path):
+    if path:
+        return load_corpus(path)
+    return [to_binary(init_grid)]
+
+def run_sprt(new, old, sprt, jobs, maxGames, maps, first_turn_timeout=FIRST_TURN_TIMEOUT, turn_timeout=TURN_TIMEOUT,
+             store=None):
+    # `store`: a ResultStore the games are added to, the games it already
+    # has are counted again instead of being played
+    finished = store.games(game_id('sprt', new, old, '')) if store else {}
+    index = 0
+    pending = {}
+    with ProcessPoolExecutor(jobs, initializer=shmring.closeAtExit) as executor:
+        while True:
+            while len(pending) < jobs and index < maxGames:
+                gameId = game_id('sprt', new, old, index)
+                if gameId in finished:
+                    sprt.update(pairing_score(finished[gameId]['winner'], index))
+                else:
+                    pending[executor.submit(play_pairing, new, old, index, pick_map(maps, index),
+                                            first_turn_timeout, turn_timeout)] = index
+                index += 1
+                if sprt.status() is not None:
+                    break
+            if not pending or sprt.status() is not None:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                gameIndex = pending.pop(future)
+                result = future.result()
+                if store:
+                    store.add(game_id('sprt', new, old, gameIndex), pairing_bots(new, old, gameIndex),
+                              pick_map(maps, gameIndex), gameIndex, result)
+                sprt.update(pairing_score(result['winner'], gameIndex))
+            print('games {} (+{} ={} -{}), llr {:.3f} [{:.3f}, {:.3f}]'.format(
+                sprt.games(), sprt.wins, sprt.draws, sprt.losses, sprt.llr(), sprt.lower, sprt.upper), flush=True)
+            if sprt.status() is not None:
+                break
+        # the games still running can't change the decision anymore
+        for future in pending:
+            future.cancel()
+    return sprt.status()
+
+def run_ladder(bots, jobs, maxGames, maps, z: float, first_turn_timeout=FIRST_TURN_TIMEOUT,
+               turn_timeout=TURN_TIMEOUT, store=None):
+    # plays the most informative pairing until the ranking is settled, every
+    # two neighbours `z` standard deviations apart, or `maxGames` are played.
+    # The games of a pairing are numbered to alternate colours.
+    names = [botName(bot) for bot in bots]
+    model = BradleyTerry(len(bots))
+    played = {}
+    if store:
+        for game in store.games('ladder:').values():
+            blue, red = [botName(bot) for bot in game['bots']]
+            if blue in names and red in names and blue != red:
+                index = int(game['id'].rsplit(':', 1)[1])
+                # the first bot of the id is blue in the even games
+                i, j = (names.index(blue), names.index(red)) if index % SIDE_COUNT == 0 else (names.index(red), names.index(blue))
+                played[i, j] = max(played.get((i, j), 0), index + 1)
+                model.update(i, j, pairing_score(game['winner'], index))
+    model.fit()
+    pending = {}
+    with ProcessPoolExecutor(jobs, initializer=shmring.closeAtExit) as executor:
+        while True:
+            while len(pending) < jobs and model.played() + len(pending) < maxGames and model.ranking()[1] < z:
+                i, j = model.nextPairing([game[:2] for game in pending.values()])
+                if (j, i) in played:
+                    i, j = j, i
+                index = played.get((i, j), 0)
+                played[i, j] = index + 1
+                init_data = pick_map(maps, model.played() + len(pending))
+                future = executor.submit(play_pairing, bots[i], bots[j], index, init_data, first_turn_timeout, turn_timeout)
+                pending[future] = (i, j, index, init_data)
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, j, index, init_data = pending.pop(future)
+                result = future.result()
+                if store:
+                    store.add(game_id('ladder', bots[i], bots[j], index), pairing_bots(bots[i], bots[j], index),
+                              init_data, index, result)
+                model.update(i, j, pairing_score(result['winner'], index))
+            model.fit()
+            table, spread = model.ranking()
+            print('games {}: {}, z {:.2f}'.format(model.played(), ', '.join(
+                '{} {:+.0f}±{:.0f}'.format(names[i], elo, sd) for i, elo, sd in table), spread), flush=True)
+        for future in pending:
+            future.cancel()
+    return model
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Tank tournaments between Botzone bots.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sprt = subparsers.add_parser('sprt', help='play a new bot against an old one until an SPRT decides')
+    sprt.add_argument('--new', default='python main-ht.py', help='command or strategy name of the new bot')
+    sprt.add_argument('--old', default='python main.py', help='command or strategy name of the old bot')
+    sprt.add_argument('--elo0', type=float, default=0.0, help='elo difference of H0')
+    sprt.add_argument('--elo1', type=float, default=10.0, help='elo difference of H1')
+    sprt.add_argument('--alpha', type=float, default=0.05, help='false positive rate')
+    sprt.add_argument('--beta', type=float, default=0.05, help='false negative rate')
+    sprt.add_argument('--max-games', type=int, default=20000, help='give up after this many games')
+
+    ladder = subparsers.add_parser('ladder', help='rank bots, playing the pairings that tell the most about them')
+    ladder.add_argument('--bot', action='append', required=True,
+                        help='command or strategy name of a bot, once per bot')
+    ladder.add_argument('-z', type=float, default=2.0,
+                        help='stop when every two neighbours of the ranking are this many standard deviations apart')
+    ladder.add_argument('--max-games', type=int, default=2000, help='stop after this many games')
+
+    for subparser in [sprt, ladder]:
+        subparser.add_argument('--maps', help='corpus of maps generated by mapgen.py to play on')
+        subparser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='games played in parallel')
+        subparser.add_argument('--first-turn-timeout', type=float, default=FIRST_TURN_TIMEOUT,
+                               help='time limit of the first turn, in seconds')
+        subparser.add_argument('--turn-timeout', type=float, default=TURN_TIMEOUT,
+                               help='time limit of the other turns, in seconds')
+        subparser.add_argument('--profile', help='profile the decisions of the bots into this directory')
+        subparser.add_argument('--profile-mode', choices=profiling.MODES, default=profiling.MODES[0],
+                               help='deterministic (cProfile) or sampling profiler')
+        subparser.add_argument('--results', help='SQLite database to store the games in and resume from')
+        subparser.add_argument('--transport', choices=['json', 'shm'], default='json',
+                               help='JSON lines as on Botzone, or shared memory with the bots kept between games')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.profile:
+        profiling.enable(args.profile, args.profile_mode)
+    if args.transport == 'shm':
+        # before the pool of games is started, its processes inherit it
+        shmring.enable()
+    store = ResultStore(args.results) if args.results else None
+    # a preempted machine gets SIGTERM: leave through the finally below so
+    # that the buffered games are stored
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    try:
+        if args.command == 'sprt':
+            result = run_sprt(parse_bot(args.new), parse_bot(args.old),
+                              SPRT(args.elo0, args.elo1, args.alpha, args.beta), args.jobs, args.max_games,
+                              load_maps(args.maps), args.first_turn_timeout, args.turn_timeout, store)
+            if result == 'H1':
+                print('H1 accepted: the new bot is {} elo stronger'.format(args.elo1))
+            elif result == 'H0':
+                print('H0 accepted: the new bot is {} elo stronger'.format(args.elo0))
+            else:
+                print('no decision after {} games'.format(args.max_games))
+        elif args.command == 'ladder':
+            if len(args.bot) < 2:
+                sys.exit('a ladder needs two bots or more')
+            bots = [parse_bot(bot) for bot in args.bot]
+            model = run_ladder(bots, args.jobs, args.max_games, load_maps(args.maps), args.z,
+                               args.first_turn_timeout, args.turn_timeout, store)
+            table, spread = model.ranking()
+            for rank, (i, elo, sd) in enumerate(table):
+                print('{:2d}. {:+7.1f} ±{:5.1f}  {}'.format(rank + 1, elo, sd, botName(bots[i])))
+    finally:
+        if store:
+            store.close()
+    if args.profile:
+        for path in profiling.collect(args.profile):
+            print('profile', path)
@@ -0,0 +1,118 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import engine
+from engine import FieldItemType
+
+# Chrome trace events (chrome://tracing, ui.perfetto.dev) of a match. Each
+# process streams its events to its own file in the JSON array format,
+# one event per line and without the closing bracket, so the file of a
+# bot killed by the driver is still complete. The driver merges the files
+# of a match into one trace. Timestamps are microseconds of
+# time.monotonic(), the same clock in every process.
+
+def now() -> int:
+    return int(time.monotonic() * 1e6)
+
+class Tracer:
+
+    def __init__(self, path: str):
+        self.pid = os.getpid()
+        # the row of the events, the driver uses one per side
+        self.tid = 0
+        self.file = open(path, 'w')
+        self.file.write('[\n')
+
+    def emit(self, event: dict):
+        event.setdefault('pid', self.pid)
+        event.setdefault('tid', self.tid)
+        self.file.write(json.dumps(event) + ',\n')
+        self.file.flush()
+
+    @contextmanager
+    def span(self, name: str, **args):
+        start = now()
+        try:
+            yield
+        finally:
+            self.complete(name, start, now() - start, **args)
+
+    def complete(self, name: str, start: int, duration: int, tid: int = None, **args):
+        event = {'name': name, 'ph': 'X', 'ts': start, 'dur': duration, 'args': args}
+        if tid is not None:
+            event['tid'] = tid
+        self.emit(event)
+
+    def instant(self, name: str, tid: int = None, **args):
+        event = {'name': name, 'ph': 'i', 's': 't', 'ts': now(), 'args': args}
+        if tid is not None:
+            event['tid'] = tid
+        self.emit(event)
+
+    def nameProcess(self, name: str, pid: int = None):
+        self.emit({'name': 'process_name', 'ph': 'M', 'pid': pid or self.pid, 'args': {'name': name}})
+
+    def nameThread(self, name: str, tid: int, pid: int = None):
+        self.emit({'name': 'thread_name', 'ph': 'M', 'pid': pid or self.pid, 'tid': tid, 'args': {'name': name}})
+
+    def close(self):
+        self.file.close()
+
+def start(path: str) -> Tracer:
+    # traces the spans of engine.span() in this process to `path`
+    engine.activeTracer = Tracer(path)
+    return engine.activeTracer
+
+def stop():
+    if engine.activeTracer:
+        engine.activeTracer.close()
+        engine.activeTracer = None
+
+def load(path: str) -> list:
+    with open(path) as f:
+        body = f.read().strip().lstrip('[').rstrip(']').strip().rstrip(',')
+    return json.loads('[' + body + ']')
+
+def merge(paths, output: str):
+    events = []
+    for path in paths:
+        events.extend(load(path))
+    with open(output, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+class FieldTracer:
+    # instant events for the bricks and tanks that doActions destroys. A
+    # moving tank is removed and inserted back at once, so a removed tank
+    # is only reported by flush() if it wasn't inserted since.
+
+    def __init__(self, tracer: Tracer, field, tid: int = None):
+        self.tracer = tracer
+        self.tid = tid
+        self.field = field
+        self.removed = []
+        field.observers.append(self)
+
+    def detach(self):
+        self.field.observers.remove(self)
+
+    def itemInserted(self, item):
+        if item in self.removed:
+            self.removed.remove(item)
+
+    def itemRemoved(self, item):
+        if item.itemType == FieldItemType.Brick:
+            self.tracer.instant('brick destroyed', self.tid, x=item.x, y=item.y)
+        elif item.itemType == FieldItemType.Tank:
+            self.removed.append(item)
+        elif item.itemType == FieldItemType.Base:
+            self.tracer.instant('base destroyed', self.tid, side=item.side)
+
+    def flush(self):
+        for tank in self.removed:
+            self.tracer.instant('tank destroyed', self.tid, side=tank.side, tank=tank.tankID, x=tank.x, y=tank.y)
+        self.removed = []
@@ -0,0 +1,136 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import os
+import random
+import shlex
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from drive import FIRST_TURN_TIMEOUT, TURN_TIMEOUT
+from strategies import load_module
+from tournament import pairing_score, play_pairing, pick_map, load_maps
+
+# the tunable entries of PARAMS in main-ht.py with their bounds, the
+# optimizer works on values normalized to [0, 1]
+TUNABLE = [
+    ('shootBasePriority', 0.0, 4.0),
+    ('shootTankPriority', 0.0, 4.0),
+    ('shootBeforehandPriority', 0.0, 4.0),
+    ('protectPriority', 0.0, 4.0),
+    ('otherwisePriority', 0.0, 4.0),
+    ('waitThreshold', 0.0, 1.0),
+    ('waitAfterShootThreshold', 0.0, 1.0),
+]
+
+BOT = 'main-ht.py'
+
+def load_default_params():
+    return dict(load_module(BOT).PARAMS)
+
+def to_params(theta):
+    return {name: round(lower + (upper - lower) * value, 3) for (name, lower, upper), value in zip(TUNABLE, theta)}
+
+def to_theta(params):
+    return [(params[name] - lower) / (upper - lower) for name, lower, upper in TUNABLE]
+
+def bot_command(params):
+    return [sys.executable, BOT, json.dumps(params, sort_keys=True)]
+
+class FitnessCache:
+    # score sums and game counts of the parameter vectors evaluated so far,
+    # kept on disk so that an interrupted run doesn't play them again
+    def __init__(self, path: str = None):
+        self.path = path
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def key(self, params) -> str:
+        return json.dumps(params, sort_keys=True)
+
+    def get(self, params):
+        return self.entries.get(self.key(params), [0.0, 0])
+
+    def add(self, params, score: float, games: int):
+        entry = self.get(params)
+        self.entries[self.key(params)] = [entry[0] + score, entry[1] + games]
+
+    def save(self):
+        if self.path:
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump(self.entries, f)
+            os.replace(self.path + '.tmp', self.path)
+
+def evaluate(executor, cache, candidates, baseline, games, maps, first_turn_timeout, turn_timeout):
+    # play the missing games of all the candidates at once, so that every
+    # core is busy, and return the mean score of each against the baseline.
+    # Equal candidates share their games, played once.
+    futures = {}
+    for params in candidates:
+        key = cache.key(params)
+        if key not in futures:
+            futures[key] = params, [(index, executor.submit(play_pairing, bot_command(params), baseline, index,
+                                                            pick_map(maps, index), first_turn_timeout, turn_timeout))
+                                    for index in range(cache.get(params)[1], games)]
+    for params, pending in futures.values():
+        if pending:
+            cache.add(params, sum(pairing_score(future.result()['winner'], index) for index, future in pending),
+                      len(pending))
+    cache.save()
+    return [cache.get(params)[0] / cache.get(params)[1] for params in candidates]
+
+def spsa(theta, iterations, a, c, games, jobs, cache, baseline, maps, first_turn_timeout, turn_timeout):
+    # simultaneous perturbation stochastic approximation, maximizing the
+    # score against the baseline with two evaluations per iteration
+    stability = iterations / 10
+    with ProcessPoolExecutor(jobs) as executor:
+        for k in range(iterations):
+            ak = a / (k + 1 + stability) ** 0.602
+            ck = c / (k + 1) ** 0.101
+            delta = [random.choice([-1, 1]) for value in theta]
+            plus = [min(1.0, max(0.0, value + ck * d)) for value, d in zip(theta, delta)]
+            minus = [min(1.0, max(0.0, value - ck * d)) for value, d in zip(theta, delta)]
+            if to_params(plus) == to_params(minus):
+                # clamped to the same point, the games would tell nothing
+                print('iteration {}: no perturbation left, skipped'.format(k), flush=True)
+                continue
+            scorePlus, scoreMinus = evaluate(executor, cache, [to_params(plus), to_params(minus)], baseline,
+                                             games, maps, first_turn_timeout, turn_timeout)
+            gradient = (scorePlus - scoreMinus) / (2 * ck)
+            theta = [min(1.0, max(0.0, value + ak * gradient * d)) for value, d in zip(theta, delta)]
+            print('iteration {}: {:.3f} / {:.3f} -> {}'.format(k, scorePlus, scoreMinus, json.dumps(to_params(theta))), flush=True)
+    return theta
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Tune the constants of {} by parallel self-play.'.format(BOT))
+    parser.add_argument('--iterations', type=int, default=100, help='number of SPSA iterations')
+    parser.add_argument('--games', type=int, default=64, help='games per evaluated parameter vector')
+    parser.add_argument('-a', type=float, default=0.2, help='SPSA step size')
+    parser.add_argument('-c', type=float, default=0.1, help='SPSA perturbation size')
+    parser.add_argument('--start', help='JSON parameters to start from, the defaults of the bot if not given')
+    parser.add_argument('--baseline', help='command of the opponent, the bot with its defaults if not given')
+    parser.add_argument('--cache', default='tune-cache.json', help='file of the fitness cache')
+    parser.add_argument('--maps', help='corpus of maps generated by mapgen.py to play on')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='games played in parallel')
+    parser.add_argument('--first-turn-timeout', type=float, default=FIRST_TURN_TIMEOUT,
+                        help='time limit of the first turn, in seconds')
+    parser.add_argument('--turn-timeout', type=float, default=TURN_TIMEOUT,
+                        help='time limit of the other turns, in seconds')
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.games < 1:
+        sys.exit('--games must be at least 1')
+    params = load_default_params()
+    if args.start:
+        params.update(json.loads(args.start))
+    baseline = shlex.split(args.baseline) if args.baseline else [sys.executable, BOT]
+
+    theta = spsa(to_theta(params), args.iterations, args.a, args.c, args.games, args.jobs, FitnessCache(args.cache),
+                 baseline, load_maps(args.maps), args.first_turn_timeout, args.turn_timeout)
+    print(json.dumps(to_params(theta)))